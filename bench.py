@@ -0,0 +1,60 @@
+# Throughput benchmarks for the Python side of PyEtaler.
+# Run `python3 bench.py` to run all of them, or `python3 bench.py <name>` for one.
+from etaler import et
+import numpy as np
+import sys
+import time
+
+def timeit(func, repeat: int=20) -> float:
+    func() # warm up (cppyy JITs templates on first use)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+def report(name: str, seconds: float, items: int, unit: str='bits'):
+    print('{:<40} {:>10.3f} ms {:>14.1f} M{}/s'.format(name, seconds*1e3, items/seconds/1e6, unit))
+
+def bench_brainblocks():
+    try:
+        from brainblocks.blocks import BlankBlock
+    except ImportError:
+        print('brainblocks not installed. Skipping')
+        return
+    bits = np.random.rand(1 << 16) < 0.02
+    t = et.Tensor.from_numpy(bits)
+    block = t.to_brainblocks()
+    report('Tensor.to_brainblocks', timeit(lambda: t.to_brainblocks()), bits.size)
+    report('Tensor.from_brainblocks', timeit(lambda: et.Tensor.from_brainblocks(block)), bits.size)
+
+# Memory used by the permanences and how much the SpatialPooler's output changes
+# after a round trip through each compact precision
+def bench_compact_permanence():
+    sp = et.SpatialPooler((1024, ), (4096, ))
+    inputs = [et.Tensor.from_numpy(np.random.rand(1024) < 0.1) for _ in range(64)]
+    for x in inputs:
+        sp.learn(x, sp.compute(x))
+    expected = [sp.compute(x).numpy() for x in inputs]
+    full = sp.memory_report()['components']['permanences']
+    print('{:<10} {:>14} {:>10}'.format('precision', 'permanences', 'overlap'))
+    print('{:<10} {:>12}KB {:>10.4f}'.format('float', full // 1024, 1))
+    for precision in et.memory.precisions:
+        compact = et.memory.compact_state(sp, precision)
+        nbytes = sum(v.nbytes if isinstance(v, np.ndarray) else et.memory.tensor_bytes(v)
+            for v in compact.permanences.values())
+        restored = et.SpatialPooler((1024, ), (4096, ))
+        et.memory.restore_state(restored, compact)
+        # Fraction of the active bits that are still active
+        overlap = np.mean([np.logical_and(restored.compute(x).numpy(), y).sum() / max(1, y.sum())
+            for x, y in zip(inputs, expected)])
+        print('{:<10} {:>12}KB {:>10.4f}'.format(precision, nbytes // 1024, overlap))
+
+benchmarks = {
+    'brainblocks': bench_brainblocks,
+    'compact_permanence': bench_compact_permanence,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] if len(sys.argv) > 1 else benchmarks.keys()
+    for name in names:
+        benchmarks[name]()
@@ -1,11 +1,17 @@
-import cppyy
-import os
+import time
+import_start = time.perf_counter()
 
-src_dir = os.path.dirname(os.path.realpath(__file__))
-cppyy.load_reflection_info(os.path.join(src_dir, "etaler_rflx.so"))
+import cppyy
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import ctypes
+import numbers
 
+from . import dictionaries
+dictionaries.load_core()
 
-from cppyy.gbl import et
+# Names in the lazily loaded dictionaries are resolved on first access
+et = dictionaries.LazyNamespace(cppyy.gbl.et)
 from cppyy.gbl import std
 
 # cppyy does not print reflections like ROOT does
@@ -29,6 +35,122 @@ from cppyy.gbl import std
 #}
 #""")
 
+# Native helpers. These exist so bulk operations can be done in a single cppyy
+# call instead of one call per element.
+cppyy.cppdef("""
+namespace etpy {
+
+// Construct a tensor from a raw host address. The data is copied into the
+// backend with a single memcpy (Etaler tensors always own their storage)
+inline et::Tensor tensorFromAddress(const et::Shape& shape, et::DType dtype, std::uintptr_t address, et::Backend* backend)
+{
+	const void* ptr = reinterpret_cast<const void*>(address);
+	if(dtype == et::DType::Bool)
+		return et::Tensor(shape, reinterpret_cast<const bool*>(ptr), backend);
+	else if(dtype == et::DType::Int32)
+		return et::Tensor(shape, reinterpret_cast<const int32_t*>(ptr), backend);
+	else if(dtype == et::DType::Float)
+		return et::Tensor(shape, reinterpret_cast<const float*>(ptr), backend);
+	else if(dtype == et::DType::Half)
+		return et::Tensor(shape, reinterpret_cast<const et::half*>(ptr), backend);
+	throw et::EtError("Cannot create a tensor with an unknown DType");
+}
+
+// Address of the tensor's storage if it can be read directly from the host. 0 otherwise
+inline std::uintptr_t hostAddress(et::Tensor t)
+{
+	if(t.has_value() == false || t.isplain() == false || t.backend()->name() != "CPU")
+		return 0;
+	return reinterpret_cast<std::uintptr_t>(t.data());
+}
+
+template <typename T>
+inline void copyToAddressImpl(const et::Tensor& t, std::uintptr_t address)
+{
+	if(t.backend()->name() == "CPU") {
+		// Host tensors are copied directly, without an intermediate std::vector
+		et::Tensor c = t.isplain() ? t : t.realize();
+		const T* ptr = reinterpret_cast<const T*>(c.data());
+		std::copy(ptr, ptr+c.size(), reinterpret_cast<T*>(address));
+		return;
+	}
+	auto vec = t.toHost<T>();
+	// std::copy also unpacks std::vector<bool>
+	std::copy(vec.begin(), vec.end(), reinterpret_cast<T*>(address));
+}
+
+// toHost<T>() into an existing vector. The vector's capacity is reused
+template <typename T>
+inline void toHostInto(const et::Tensor& t, std::vector<T>& out)
+{
+	if(t.backend()->name() == "CPU") {
+		et::Tensor c = t.isplain() ? t : t.realize();
+		const T* ptr = reinterpret_cast<const T*>(c.data());
+		out.assign(ptr, ptr+c.size());
+		return;
+	}
+	out = t.toHost<T>();
+}
+
+// Copy the content of a tensor (from any backend) into a host buffer
+inline void copyToAddress(const et::Tensor& t, std::uintptr_t address)
+{
+	et::DType dtype = t.dtype();
+	if(dtype == et::DType::Bool)
+		copyToAddressImpl<bool>(t, address);
+	else if(dtype == et::DType::Int32)
+		copyToAddressImpl<int32_t>(t, address);
+	else if(dtype == et::DType::Float)
+		copyToAddressImpl<float>(t, address);
+	else if(dtype == et::DType::Half)
+		copyToAddressImpl<et::half>(t, address);
+	else
+		throw et::EtError("Cannot copy a tensor with an unknown DType");
+}
+
+template <typename T>
+inline std::uintptr_t vectorAddress(const std::vector<T>& vec)
+{
+	return reinterpret_cast<std::uintptr_t>(vec.data());
+}
+
+// Address of a Shape's elements. Lets Python read it in one go with ctypes
+inline std::uintptr_t shapeData(const et::Shape& s)
+{
+	static_assert(sizeof(s[0]) == sizeof(int64_t));
+	return reinterpret_cast<std::uintptr_t>(s.data());
+}
+
+// Writes {dtype, size, dims...} of `t` into `capacity` int64 at `address`. Returns
+// the number of dimensions, -1 if the tensor has no value
+inline intmax_t tensorMeta(const et::Tensor& t, std::uintptr_t address, size_t capacity)
+{
+	if(t.has_value() == false)
+		return -1;
+	int64_t* out = reinterpret_cast<int64_t*>(address);
+	const et::Shape& s = t.shape();
+	if(s.size() + 2 > capacity)
+		throw et::EtError("tensorMeta: too many dimensions");
+	out[0] = (int64_t)t.dtype();
+	out[1] = t.size();
+	std::copy(s.begin(), s.end(), out+2);
+	return s.size();
+}
+
+// Size of the first axis. 0 for empty tensors and -1 for 0-d tensors
+inline intmax_t tensorLength(const et::Tensor& t)
+{
+	if(t.has_value() == false)
+		return 0;
+	if(t.dimentions() == 0)
+		return -1;
+	return t.shape()[0];
+}
+
+}
+""")
+etpy = cppyy.gbl.etpy
+
 # helper functions
 
 def type_from_dtype(dtype):
@@ -45,6 +167,25 @@ def type_from_dtype(dtype):
 
 et.dtypeToType = type_from_dtype
 
+# Number of bytes each element of a DType takes
+def dtype_size(dtype) -> int:
+    if dtype == et.DType.Bool:
+        return 1
+    elif dtype == et.DType.Int:
+        return 4
+    elif dtype == et.DType.Float:
+        return 4
+    elif dtype == et.DType.Half:
+        return 2
+    else:
+        raise ValueError("DType {} not recognized".format(dtype))
+
+# Let other Python threads run while these (potentially long running) native
+# functions are running. They must not touch Python objects
+def release_gil(*funcs):
+    for f in funcs:
+        f.__release_gil__ = True
+
 def in_bound(idx: int, size: int):
     if idx is None:
         return True
@@ -83,15 +224,15 @@ def pythonic_shape_func(shape, func, dtype=None) -> et.Tensor:
     shape_t = type(shape)
     if dtype is None:
         dtype = et.DType.Int32
-    if shape_t in (tuple, list, et.Shape):
+    if shape_t is tuple or shape_t is list or shape_t is et.Shape:
         return func(shape, dtype)
-    elif shape_t in (int, np.int, np.int32):
-        return pythonic_shape_func((shape, ), func)
+    elif isinstance(shape, numbers.Integral): # int and numpy integers
+        return func((int(shape), ), dtype)
     else:
         raise TypeError("Cannot run shape function with type {}".format(shape_t))
 et.ones = lambda shape, dtype=None: pythonic_shape_func(shape, cpp_ones, dtype)
 et.zeros = lambda shape, dtype=None: pythonic_shape_func(shape, cpp_zeros, dtype)
-et.constant = lambda shape, val: pythonic_shape_func(shape, lambda s: cpp_constant(s. val))
+et.constant = lambda shape, val: pythonic_shape_func(shape, lambda s, dtype: cpp_constant(s, val))
 
 def is_index_good(self, idx):
     if type(idx) is int:
@@ -105,8 +246,16 @@ def is_index_good(self, idx):
         raise IndexError("Cannot have step size of 0")
 et.Shape.is_index_good = is_index_good
 
+# Read the whole Shape in a single native call
+def shape_to_tuple(self: et.Shape) -> tuple:
+    n = self.size()
+    if n == 0:
+        return ()
+    return tuple((ctypes.c_int64 * n).from_address(etpy.shapeData(self)))
+et.Shape.to_tuple = shape_to_tuple
+
 def shape_to_list(self: et.Shape):
-    return [int(d) for d in self]
+    return list(shape_to_tuple(self))
 et.Shape.to_list = shape_to_list
 
 # Override et.Shape's __getitem__ and __setitem__
@@ -121,15 +270,8 @@ def get_subshape(self: et.Shape, idx) -> et.Shape:
     elif type(idx) is not slice and type(idx) is not range:
         raise TypeError("Cannot index with type {}".format(type(idx)))
 
-    # Unfortunatelly iterators doesn't work like in C++ :(
-    # We can't do `it += 3` in Python
-    start = idx.start if idx.start is not None else 0
-    stop = idx.stop if idx.stop is not None else self.size()
-    step = idx.step if idx.step is not None else 1
-    res = et.Shape()
-    for i in range(start, stop, step):
-        res.push_back(self[i])
-    return res
+    # Sliced in Python and converted back in one go
+    return et.Shape(shape_to_tuple(self)[slice(idx.start, idx.stop, idx.step)])
 
 def set_subshape(self: et.Shape, idx, value):
     self.is_index_good(idx)
@@ -151,65 +293,187 @@ et.Shape.__getitem__ = get_subshape
 et.Shape.__setitem__ = set_subshape
 
 # Override the __setitem__ and __getitem__ function of et.Tensor
-# To allow Python style subscription
-def get_tensor_view(self: et.Tensor, slices) -> et.Tensor:
-    tup = None
-    if type(slices) in (int, range, slice):
-        tup = (slices,)
-    else:
-        tup = slices
-
-    rgs = et.IndexList(len(tup))
-    for i, r in enumerate(tup):
+# To allow Python style subscription. The indices are sent to C++ in a single call
+# as a flat list of (is_range, start, stop, step) per axis. INTMAX_MIN stands for None
+cppyy.cppdef("""
+#include <limits>
+#include <optional>
+
+namespace etpy {
+
+constexpr intmax_t none_index = std::numeric_limits<intmax_t>::min();
+
+inline et::IndexList toIndexList(const std::vector<intmax_t>& spec)
+{
+	auto opt = [](intmax_t v) {
+		return v == none_index ? std::optional<intmax_t>() : std::optional<intmax_t>(v);
+	};
+	et::IndexList indices;
+	for(size_t i=0;i+3<spec.size();i+=4) {
+		if(spec[i] == 0)
+			indices.push_back(spec[i+1]);
+		else
+			indices.push_back(et::Range(opt(spec[i+1]), opt(spec[i+2]), opt(spec[i+3])));
+	}
+	return indices;
+}
+
+inline et::Tensor indexView(et::Tensor t, const std::vector<intmax_t>& spec)
+{
+	return t.view(toIndexList(spec));
+}
+
+// Fast path when all indices are integers
+inline et::Tensor pointView(et::Tensor t, const std::vector<intmax_t>& indices)
+{
+	et::IndexList l;
+	for(auto i : indices)
+		l.push_back(i);
+	return t.view(l);
+}
+
+// Writes into the view in place. brodcast_to is lazy, no temporary copy is made
+inline void assignIndexed(et::Tensor t, const std::vector<intmax_t>& spec, const et::Tensor& value)
+{
+	et::Tensor v = t.view(toIndexList(spec));
+	if(v.shape() == value.shape())
+		v.assign(value);
+	else
+		v.assign(et::brodcast_to(value, v.shape()));
+}
+
+}
+""")
+none_index = -2**63 # Same as etpy::none_index
+
+def index_spec(tup) -> list:
+    spec = []
+    for r in tup:
         if type(r) is int:
-            rgs[i] = r
+            spec += (0, r, 0, 0)
         elif type(r) is range or type(r) is slice:
-            start = std.nullopt if r.start is None else r.start
-            stop = std.nullopt if r.stop is None else r.stop
-            step = std.nullopt if r.step is None else r.step
-            rgs[i] = et.Range(start, stop, step)
+            spec += (1, none_index if r.start is None else r.start
+                , none_index if r.stop is None else r.stop
+                , none_index if r.step is None else r.step)
             # No need to check to out-of-bounds access. The C++ side does that
         else:
             raise TypeError("indices must be a int, range or slice")
+    return spec
 
-    return self.view(rgs)
+def get_tensor_view(self: et.Tensor, slices) -> et.Tensor:
+    if type(slices) is int:
+        return etpy.pointView(self, [slices])
+    tup = (slices,) if type(slices) in (range, slice) else slices
+    if all(type(r) is int for r in tup):
+        return etpy.pointView(self, list(tup))
+    return etpy.indexView(self, index_spec(tup))
 
 def tensor_setitem(self: et.Tensor, slices, value):
-    rhs = self.__getitem__(slices)
-    lhs = et.brodcast_to(value, rhs.shape())
-    rhs.assign(et.ravel(lhs)) # FIXME: Shouldn't need ravel. This is slow and not needed in the C++ side
+    tup = (slices,) if type(slices) in (int, range, slice) else slices
+    etpy.assignIndexed(self, index_spec(tup), value)
 
 et.Tensor.__getitem__ = get_tensor_view
 et.Tensor.__setitem__ = tensor_setitem
 
-# Override the default C++ item<T>() with a Python one
-cpp_get_tensor_item = et.Tensor.item
+# Override the default C++ item<T>() with a Python one. The native helpers
+# return Python scalars directly (Half is returned as a float)
+cppyy.cppdef("""
+namespace etpy {
+
+inline bool itemBool(const et::Tensor& t) {return t.item<bool>();}
+inline int32_t itemInt(const et::Tensor& t) {return t.item<int32_t>();}
+inline float itemFloat(const et::Tensor& t) {return t.item<float>();}
+inline float itemHalf(const et::Tensor& t) {return float(t.item<et::half>());}
+
+}
+""")
+# Looking up cppyy template instantiations is slow. So they are resolved
+# once for each DType at import time
+item_dispatch = {
+    int(et.DType.Bool): etpy.itemBool,
+    int(et.DType.Int32): etpy.itemInt,
+    int(et.DType.Float): etpy.itemFloat,
+    int(et.DType.Half): etpy.itemHalf,
+}
 def get_tensor_item(self: et.Tensor):
-    return cpp_get_tensor_item[et.dtypeToType(self.dtype())](self)
+    func = item_dispatch.get(int(self.dtype()))
+    if func is None:
+        raise ValueError("DType {} not recognized".format(self.dtype()))
+    return func(self)
 et.Tensor.item = get_tensor_item
 
 # Override the default C++ toHost<T> with a Python one
 # XXX: Should the function return a list/np.array instead of a std.vector?
 # NOTE: We use vector<bool> to handle boolean tensors. But vector<bool> in C++ is a compressed vector
 cpp_tensor_to_host = et.Tensor.toHost
-def tensor_to_host(self: et.Tensor):
-    return cpp_tensor_to_host[et.dtypeToType(self.dtype())](self)
+to_host_dispatch = {int(d): cpp_tensor_to_host[type_from_dtype(d)]
+    for d in (et.DType.Bool, et.DType.Int32, et.DType.Float, et.DType.Half)}
+to_host_into_dispatch = {int(d): etpy.toHostInto[type_from_dtype(d)]
+    for d in (et.DType.Bool, et.DType.Int32, et.DType.Float, et.DType.Half)}
+# With `out`, the content is written into the given std::vector (resized as needed)
+# instead of a new one. So the same buffer can be reused across steps
+def tensor_to_host(self: et.Tensor, out=None):
+    dispatch = to_host_dispatch if out is None else to_host_into_dispatch
+    func = dispatch.get(int(self.dtype()))
+    if func is None:
+        raise ValueError("DType {} not recognized".format(self.dtype()))
+    if out is None:
+        return func(self)
+    func(self, out)
+    return out
 et.Tensor.toHost = tensor_to_host
 
+release_gil(et.Tensor.copy, et.Tensor.realize, et.Tensor.cast, et.Tensor.sum, etpy.tensorFromAddress
+    , etpy.copyToAddress, *to_host_dispatch.values(), *to_host_into_dispatch.values())
+
+# Shape, number of dimensions, DType and number of elements of a tensor. Read from
+# Etaler in a single call and cached in the Python handle the first time they are
+# used. The operators never change a tensor's shape or DType in place. But a handle to a
+# C++ data member can be reassigned from C++, use t.read_meta() to read it again
+TensorMeta = namedtuple('TensorMeta', ['shape', 'ndim', 'dtype', 'size'])
+meta_capacity = 66 # dtype, size and up to 64 dimensions
+meta_dtypes = {int(d): d for d in (et.DType.Bool, et.DType.Int32, et.DType.Float, et.DType.Half)}
+def read_meta(self: et.Tensor) -> TensorMeta:
+    buf = (ctypes.c_int64 * meta_capacity)()
+    ndim = etpy.tensorMeta(self, ctypes.addressof(buf), meta_capacity)
+    if ndim < 0:
+        return TensorMeta((), 0, None, 0)
+    return TensorMeta(tuple(buf[2:2+ndim]), ndim, meta_dtypes[buf[0]], buf[1])
+
+def tensor_meta(self: et.Tensor) -> TensorMeta:
+    try:
+        return self._meta
+    except AttributeError:
+        pass
+    meta = read_meta(self)
+    try:
+        self._meta = meta
+    except AttributeError: # Some handles can't hold attributes. Not cached then
+        pass
+    return meta
+et.Tensor.read_meta = read_meta
+et.Tensor.meta = property(tensor_meta)
+et.Tensor.ndim = property(lambda self: tensor_meta(self).ndim)
+
 # Handle the misleading __bool__ function generated by cppyy
 def tensor_trueness(self: et.Tensor) -> bool:
-    if self.size() == 0:
+    meta = tensor_meta(self)
+    if meta.size == 0:
         raise ValueError("The true-ness of a empty tensor is not defined.")
-    elif self.size() > 1:
+    elif meta.size > 1:
         raise  ValueError("The true-ness of a non-scalar is ambiguous. Please use any() or all()")
-    if self.has_value() is False:
-        return False
-    return self.item() != 0 if self.dtype() == et.DType.Half else bool(self.item())
+    return bool(item_dispatch[int(meta.dtype)](self))
 
 et.Tensor.__bool__ = tensor_trueness
 
 # Implement our __len__ to match numpy's behaivour
-et.Tensor.__len__ = lambda self: self.shape()[0] if self.has_value() else 0
+# A single native call, no Shape is created on the Python side
+def tensor_len(self: et.Tensor) -> int:
+    n = etpy.tensorLength(self)
+    if n < 0:
+        raise TypeError("len() of a 0-d tensor")
+    return n
+et.Tensor.__len__ = tensor_len
 
 # Handle stringify of tensors and shapes
 # HACK: I dunno why cppyy can't use et::to_string(const et::Tensor&).
@@ -233,92 +497,477 @@ def state_dict_to_dict(state_dict: et.StateDict):
             raise TypeError("Stored type not recognized by Etaler")
     return d
 
-def py_load(path: str):
+# With `lazy=True` a LazyStateDict is returned instead. It only converts entries
+# to Python when they are accessed
+def py_load(path: str, lazy: bool=False):
     state = cpp_load(path)
+    if lazy:
+        return LazyStateDict(state)
     return state_dict_to_dict(state)
 et.load = py_load
 
-# Make 2D grid cell work properly
-cpp_grid_cell_2d = et.encoder.gridCell2d
-def py_grid_cell_2d(p, num_gcm=16, active_cells_per_gcm=1, gcm_axis_length=(4, 4)
-	, scale_range=(0.3, 1), seed=42, backend = et.defaultBackend()) -> et.Tensor:
-    gcm_axis_length = to_cpp_array(gcm_axis_length, std.size_t)
-    scale_range = to_cpp_array(gcm_axis_length, float)
-    p = to_cpp_array(gcm_axis_length, float)
-
-    return cpp_grid_cell_2d(p, num_gcm, active_cells_per_gcm
-        , gcm_axis_length, scale_range, seed, backend)
-et.encoder.gridCell2d = py_grid_cell_2d
+# Make et.save also accept (nested) dicts of tensors, numpy arrays and scalars.
+# With `background=True` the data is snapshotted and written by a background
+# thread. A concurrent.futures.Future is returned in that case
+cpp_save = et.save
+release_gil(cpp_save) # Let other threads run while writing
+def py_save(state, path: str, background: bool=False):
+    if type(state) is not et.StateDict:
+        state = dict_to_state_dict(state, snapshot=background)
+    elif background:
+        state = etpy.snapshotStateDict(state) # tensors are copied, learning can continue
+    if background:
+        return save_executor().submit(cpp_save, state, path)
+    cpp_save(state, path)
+et.save = py_save
 
 # Print backend on REPL
 et.Backend.__repr__ = lambda self: cppyy.gbl.cling.printValue(self)
 
+# Runs `sp` (followed by `tm` if it is not None) over the first axis of `inputs`.
+# Returns the stacked SpatialPooler outputs of shape [T, ...]. Or a tuple of the
+# outputs and the per-step anomaly scores of shape [T] if `anomaly` is True
+def run_sequence(sp, tm, inputs, learn: bool=True, anomaly: bool=False):
+    if anomaly and tm is None:
+        raise ValueError("Anomaly scores requires a TemporalMemory")
+    if type(inputs) is not et.Tensor:
+        inputs = et.Tensor.from_numpy(inputs)
+    sdrs, scores = etpy.runSequence(sp, tm, inputs, learn)
+    return (sdrs, scores) if anomaly else sdrs
+et.run_sequence = run_sequence
+
 # interop with numpy conversion
 try:
     import numpy as np
-    def tensor_to_np(self: et.Tensor) -> np.array:
-        vec = self.toHost()
-        t = type_from_dtype(self.dtype())
-        lst = [t(x) for x in vec]
-        return np.array(lst).reshape(tuple(self.shape()))
+    # Exposes host memory owned by `owner` to numpy. The array keeps the owner alive
+    class HostMemory:
+        def __init__(self, address: int, shape: tuple, nptype, owner, readonly: bool=False):
+            self.owner = owner
+            self.__array_interface__ = {'shape': tuple(shape),
+                'typestr': np.dtype(nptype).str,
+                'data': (address, readonly),
+                'version': 3}
+
+    def host_array(address: int, shape: tuple, nptype, owner, readonly: bool=False) -> np.ndarray:
+        return np.asarray(HostMemory(address, shape, nptype, owner, readonly))
+
+    # Plain tensors on the CPU backend are exposed to numpy without copying.
+    # np.asarray(t) keeps a reference to the tensor. So the memory stays valid
+    def tensor_array_interface(self: et.Tensor) -> dict:
+        address = etpy.hostAddress(self)
+        if address == 0:
+            # Raising AttributeError makes numpy fall back to __array__
+            raise AttributeError("Only plain tensors on the CPU backend can be viewed by numpy")
+        return {'shape': tuple(self.shape()),
+                'typestr': np.dtype(ettype_to_nptype(self.dtype())).str,
+                'data': (address, False),
+                'version': 3}
+    et.Tensor.__array_interface__ = property(tensor_array_interface)
+
+    from .buffers import HostBufferPool
+    et.HostBufferPool = HostBufferPool
+
+    # `out` can be a ndarray (of the same shape and numpy type) or a HostBufferPool.
+    # The data is then written into it instead of a new array
+    def tensor_to_np(self: et.Tensor, out=None) -> np.array:
+        if out is None and etpy.hostAddress(self) != 0:
+            return np.array(self) # A single memcpy from the host buffer
+        shape = tuple(self.shape())
+        nptype = ettype_to_nptype(self.dtype())
+        if out is None:
+            out = np.empty(shape, dtype=nptype)
+        elif isinstance(out, HostBufferPool):
+            out = out.get(shape, nptype)
+        elif out.shape != shape or out.dtype != nptype or out.flags.c_contiguous is False \
+            or out.flags.writeable is False:
+            raise ValueError("out must be a writeable, C-contiguous array of shape {} and type {}".format(
+                shape, np.dtype(nptype)))
+        # Views and tensors on other backends are copied straight into the ndarray
+        etpy.copyToAddress(self, out.ctypes.data)
+        return out
     et.Tensor.numpy = tensor_to_np
+    et.Tensor.__array__ = lambda self, dtype=None, copy=None: tensor_to_np(self) if dtype is None \
+        else tensor_to_np(self).astype(dtype, copy=False)
 
     def tensor_tolist(self: et.Tensor) -> list:
         return tensor_to_np(self).tolist()
     et.Tensor.tolist = tensor_tolist
 
+    # Iterate over blocks of `rows` rows (along the first axis). Plain tensors on the CPU
+    # backend yield numpy views without copying. Otherwise each block is copied into a
+    # new array, the next block is copied in the background while the current one is
+    # used. So at most 2 blocks are in memory. With `numpy=False` tensor views are yielded
+    def tensor_iter_chunks(self: et.Tensor, rows: int, numpy: bool=True):
+        # Not a generator itself, so bad arguments raise on the call, not on the first next()
+        if rows <= 0:
+            raise ValueError("rows must be positive")
+        n = len(self)
+        def chunks():
+            if numpy is False:
+                for i in range(0, n, rows):
+                    yield etpy.indexView(self, index_spec((slice(i, min(i+rows, n)),)))
+                return
+            if etpy.hostAddress(self) != 0:
+                array = np.asarray(self)
+                for i in range(0, n, rows):
+                    yield array[i:i+rows]
+                return
+            copy_chunk = lambda i: tensor_to_np(etpy.indexView(self, index_spec((slice(i, min(i+rows, n)),))))
+            with ThreadPoolExecutor(1, thread_name_prefix='etaler-prefetch') as executor:
+                future = executor.submit(copy_chunk, 0) if n != 0 else None
+                for i in range(0, n, rows):
+                    chunk = future.result()
+                    if i + rows < n:
+                        future = executor.submit(copy_chunk, i + rows)
+                    yield chunk
+        return chunks()
+    et.Tensor.iter_chunks = tensor_iter_chunks
+
+    # np.add(t, q), np.sum(t), etc.. run on the tensor's backend
+    from .ufunc import tensor_array_ufunc, tensor_array_function
+    et.Tensor.__array_ufunc__ = tensor_array_ufunc
+    et.Tensor.__array_function__ = tensor_array_function
+
+    # Zero-copy exchange with other array libraries
+    from .dlpack import tensor_dlpack, tensor_dlpack_device, from_dlpack
+    et.Tensor.__dlpack__ = tensor_dlpack
+    et.Tensor.__dlpack_device__ = tensor_dlpack_device
+    et.from_dlpack = from_dlpack
+
     def nptype_to_ettype(dtype):
-        if dtype == np.int32 or dtype == np.int: #int is 64 bit, but anyway...
+        dtype = np.dtype(dtype)
+        if dtype.isnative is False: # ex: big-endian '>f2'. Swapped by the bulk conversion
+            dtype = dtype.newbyteorder('=')
+        if dtype == np.int32 or dtype == np.int64: #int is 64 bit, but anyway...
             return et.DType.Int32
-        elif dtype == np.float32 or dtype == np.float:
+        elif dtype == np.float32 or dtype == np.float64:
             return et.DType.Float
-        elif dtype == np.half: # np.float16 is np.half -> True
+        elif dtype == np.float16:
             return et.DType.Half
-        elif dtype == np.bool:
+        elif dtype == np.bool_:
             return et.DType.Bool
         raise ValueError("numpy type {} cannot be mapped into a Etaler type".format(dtype))
 
-    def tensor_from_numpy(array) -> et.Tensor:
-        # Try to convert to numpy array if the param is not one
-        if type(array) is not np.ndarray:
-            return tensor_from_numpy(np.array(array))
-        et_dtype = nptype_to_ettype(array.dtype)
-        cpp_type = type_from_dtype(et_dtype)
+    # The numpy type sharing the same memory layout as the Etaler type
+    def ettype_to_nptype(dtype):
+        if dtype == et.DType.Bool:
+            return np.bool_ # C++ bool is 1 byte, same as np.bool_
+        elif dtype == et.DType.Int32:
+            return np.int32
+        elif dtype == et.DType.Float:
+            return np.float32
+        elif dtype == et.DType.Half:
+            return np.float16 # et.half stores the IEEE 754 binary16 bits
+        raise ValueError("DType {} not recognized".format(dtype))
 
-        # NOTE: C++ specialized std::vector<bool> and cppyy have weird behaivor for uint8_t.
-        # Work arround it
-        if cpp_type is bool:
-            return tensor_from_numpy(array.astype(int)).cast(et.DType.Bool)
-        else:
-            vec = std.vector[cpp_type](array.size)
-            #TODO: We need a faster way to fill the vector
-            for i, v in enumerate(np.nditer(array)):
-                vec[i] = cpp_type(v)
-
-            # FIXME: We use a slower method for FP16 because cppyy can't do it the fast way
-            # for reasons
-            if cpp_type is et.half:
-                return et.Tensor(vec).reshape(et.Shape(array.shape))
-            return et.Tensor(et.Shape(array.shape), vec.data())
+    # C-contiguous `array` of type `dtype`. No-op if it already is. Otherwise a single bulk
+    # conversion is done by numpy. Raises a ValueError instead of silently wrapping
+    # integers or overflowing floats to inf when narrowing (ex: int64 -> int32)
+    def narrow_array(array: np.ndarray, dtype) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        if array.size != 0 and np.can_cast(array.dtype, dtype) is False:
+            if dtype.kind in 'iu' and array.dtype.kind in 'iu':
+                info = np.iinfo(dtype)
+                if array.min() < info.min or array.max() > info.max:
+                    raise ValueError("Values of {} out of range of {}".format(array.dtype, dtype))
+            elif dtype.kind == 'f' and array.dtype.kind == 'f':
+                big = np.abs(array) > np.finfo(dtype).max
+                if big.any() and np.isfinite(array[big]).any():
+                    raise ValueError("Values of {} out of range of {}".format(array.dtype, dtype))
+        return np.ascontiguousarray(array, dtype=dtype)
+
+    def tensor_from_numpy(array, backend=None) -> et.Tensor:
+        # Anything supporting the array protocols (lists, memoryviews, etc..) works
+        array = np.asarray(array)
+        shape = et.Shape(array.shape)
+        et_dtype = nptype_to_ettype(array.dtype)
+        array = narrow_array(array, ettype_to_nptype(et_dtype))
+        backend = et.defaultBackend() if backend is None else backend
+        return etpy.tensorFromAddress(shape, et_dtype, array.ctypes.data, backend)
     et.Tensor.from_numpy = staticmethod(tensor_from_numpy)
 
+    def tensor_from_buffer(buffer, dtype, shape=None, backend=None) -> et.Tensor:
+        # Reinterpret raw bytes (bytes, bytearray, memoryview, ...) as `dtype` without copying
+        array = np.frombuffer(buffer, dtype=ettype_to_nptype(dtype))
+        if shape is not None:
+            array = array.reshape(tuple(shape))
+        return tensor_from_numpy(array, backend)
+    et.Tensor.from_buffer = staticmethod(tensor_from_buffer)
+
+    # Brainblocks interop. Bits are converted in bulk by numpy
+    def tensor_from_brainblocks(block) -> et.Tensor:
+        bits = np.asarray(block.output.bits, dtype=np.bool_)
+        return tensor_from_numpy(bits.ravel())
+    et.Tensor.from_brainblocks = staticmethod(tensor_from_brainblocks)
+
+    def tensor_to_brainblocks(self):
+        import brainblocks
+        bits = tensor_to_np(self).ravel().astype(np.bool_, copy=False)
+        block = brainblocks.blocks.BlankBlock(num_s=bits.size)
+        try:
+            # Only the active bits needs to cross the boundary
+            block.output.acts = np.flatnonzero(bits).tolist()
+        except AttributeError: # Older brainblocks can only set all bits
+            block.output.bits = bits.astype(np.uint8).tolist()
+        return block
+    et.Tensor.to_brainblocks = tensor_to_brainblocks
+
 except ImportError:
     pass
 
-# Brainblocks interop
-def tensor_from_brainblocks(block) -> et.Tensor:
-    bits = block.output.bits
-    vec = std.vector[bool](len(bits))
-    for i,v in enumerate(vec):
-        vec[i] = v
-    return et.Tensor(et.Shape([len(bits)]), vec.data())
-et.Tensor.from_brainblocks = staticmethod(tensor_from_brainblocks)
-
-def tensor_to_brainblocks(self):
-    import brainblocks
-    tensor = self.flatten()
-    block = brainblocks.blocks.BlankBlock(num_s=len(tensor))
-    block.output.bits = list(tensor.toHost())
-    return block
-et.Tensor.to_brainblocks = tensor_to_brainblocks
+from .serialize import LazyStateDict, dict_to_state_dict, save_executor
+
+try:
+    from .sdr import SDR
+    et.SDR = SDR
+    et.Tensor.to_sdr = lambda self: SDR.from_tensor(self)
+except ImportError: # SDR requires numpy
+    pass
+
+# Memory accounting and compact permanence storage
+from . import memory
+et.memory = memory
+et.Tensor.memory_report = memory.memory_report
+
+# Incremental checkpoints
+from . import checkpoint
+et.checkpoint = checkpoint
+
+
+# Batched encoders. Encodes a buffer of values in a single native call and
+# stacks the results into a [N, ...] tensor
+encoder_helpers = """
+namespace etpy {
+
+template <typename Func>
+inline et::Tensor encodeBatch(size_t n, Func encode)
+{
+	et::Tensor res;
+	for(size_t i=0;i<n;i++) {
+		et::Tensor sdr = encode(i);
+		if(i == 0) {
+			et::Shape s = {(intmax_t)n};
+			for(auto d : sdr.shape())
+				s.push_back(d);
+			res = et::zeros(s, sdr.dtype(), sdr.backend());
+		}
+		res.view({(intmax_t)i}).assign(sdr);
+	}
+	return res;
+}
+
+inline et::Tensor scalarBatch(std::uintptr_t values, size_t n, float min, float max
+	, size_t result_sdr_length, size_t num_active_bits, et::Backend* backend)
+{
+	const float* x = reinterpret_cast<const float*>(values);
+	return encodeBatch(n, [&](size_t i) {
+		return et::encoder::scalar(x[i], min, max, result_sdr_length, num_active_bits, backend);
+	});
+}
+
+inline et::Tensor gridCell1dBatch(std::uintptr_t values, size_t n, size_t num_gcm, size_t active_cells_per_gcm
+	, size_t gcm_axis_length, std::pair<float, float> scale_range, size_t seed, et::Backend* backend)
+{
+	const float* x = reinterpret_cast<const float*>(values);
+	return encodeBatch(n, [&](size_t i) {
+		return et::encoder::gridCell1d(x[i], num_gcm, active_cells_per_gcm, gcm_axis_length
+			, scale_range, seed, backend);
+	});
+}
+
+inline et::Tensor gridCell2dBatch(std::uintptr_t values, size_t n, size_t num_gcm, size_t active_cells_per_gcm
+	, std::array<size_t, 2> gcm_axis_length, std::array<float, 2> scale_range, size_t seed, et::Backend* backend)
+{
+	const float* x = reinterpret_cast<const float*>(values);
+	return encodeBatch(n, [&](size_t i) {
+		return et::encoder::gridCell2d({x[2*i], x[2*i+1]}, num_gcm, active_cells_per_gcm, gcm_axis_length
+			, scale_range, seed, backend);
+	});
+}
+
+}
+"""
+
+# Python side patches for the encoders. Installed once the encoders are loaded
+def install_encoders():
+    # Make 2D grid cell work properly
+    cpp_grid_cell_2d = et.encoder.gridCell2d
+    def py_grid_cell_2d(p, num_gcm=16, active_cells_per_gcm=1, gcm_axis_length=(4, 4)
+        , scale_range=(0.3, 1), seed=42, backend = et.defaultBackend()) -> et.Tensor:
+        gcm_axis_length = to_cpp_array(gcm_axis_length, std.size_t)
+        scale_range = to_cpp_array(scale_range, float)
+        p = to_cpp_array(p, float)
+
+        return cpp_grid_cell_2d(p, num_gcm, active_cells_per_gcm
+            , gcm_axis_length, scale_range, seed, backend)
+    et.encoder.gridCell2d = py_grid_cell_2d
+
+    cppyy.cppdef(encoder_helpers)
+    release_gil(etpy.scalarBatch, etpy.gridCell1dBatch, etpy.gridCell2dBatch)
+
+    # Opt-in memoization of encoders
+    from .encoder_cache import cached
+    et.encoder.cached = cached
+
+    try:
+        import numpy as np
+        # Batched encoders. `x` is an array of values (or of 2D points for gridCell2dBatch).
+        # The result has the shape of the values plus a trailing axis of encoded bits
+        def encode_batch(x, point_size, func):
+            x = np.ascontiguousarray(x, dtype=np.float32)
+            if point_size != 1 and (x.ndim == 0 or x.shape[-1] != point_size):
+                raise ValueError("The last axis must have {} values".format(point_size))
+            if x.size == 0:
+                raise ValueError("Cannot encode an empty batch")
+            shape = list(x.shape) if point_size == 1 else list(x.shape[:-1])
+            res = func(x.ctypes.data, x.size // point_size)
+            return res.reshape(shape + [res.shape()[-1]])
+
+        def py_scalar_batch(x, min, max, result_sdr_length, num_active_bits, backend=None) -> et.Tensor:
+            backend = et.defaultBackend() if backend is None else backend
+            return encode_batch(x, 1, lambda data, n: etpy.scalarBatch(data, n, min, max
+                , result_sdr_length, num_active_bits, backend))
+        et.encoder.scalarBatch = py_scalar_batch
+
+        def py_grid_cell_1d_batch(x, num_gcm=16, active_cells_per_gcm=1, gcm_axis_length=4
+            , scale_range=(0.3, 1), seed=42, backend=None) -> et.Tensor:
+            backend = et.defaultBackend() if backend is None else backend
+            return encode_batch(x, 1, lambda data, n: etpy.gridCell1dBatch(data, n, num_gcm
+                , active_cells_per_gcm, gcm_axis_length, scale_range, seed, backend))
+        et.encoder.gridCell1dBatch = py_grid_cell_1d_batch
+
+        def py_grid_cell_2d_batch(x, num_gcm=16, active_cells_per_gcm=1, gcm_axis_length=(4, 4)
+            , scale_range=(0.3, 1), seed=42, backend=None) -> et.Tensor:
+            backend = et.defaultBackend() if backend is None else backend
+            # Converted once for the whole batch
+            gcm_axis_length = to_cpp_array(gcm_axis_length, std.size_t)
+            scale_range = to_cpp_array(scale_range, float)
+            return encode_batch(x, 2, lambda data, n: etpy.gridCell2dBatch(data, n, num_gcm
+                , active_cells_per_gcm, gcm_axis_length, scale_range, seed, backend))
+        et.encoder.gridCell2dBatch = py_grid_cell_2d_batch
+    except ImportError:
+        pass
+dictionaries.on_load('encoders', install_encoders)
+
+# Run a SpatialPooler/TemporalMemory over a whole sequence in C++. Avoids paying
+# the Python overhead on every time step
+algorithm_helpers = """
+namespace etpy {
+
+// A SpatialPooler optionally followed by a TemporalMemory. Keeps the TM's state
+// between steps
+struct Region
+{
+	Region(et::SpatialPooler* sp, et::TemporalMemory* tm, bool learn)
+		: sp(sp), tm(tm), learn(learn) {}
+
+	// Returns the SpatialPooler's output. The anomaly score is stored in `anomaly`
+	et::Tensor step(const et::Tensor& x)
+	{
+		et::Tensor y = sp->compute(x);
+		if(learn)
+			sp->learn(x, y);
+		if(tm == nullptr)
+			return y;
+
+		if(last_active.has_value() == false) {
+			// The TM's cells are the shape of its connections without the synapse axis
+			et::Shape cells;
+			et::Shape c = tm->connections().shape();
+			for(size_t j=0;j+1<c.size();j++)
+				cells.push_back(c[j]);
+			last_active = et::zeros(cells, et::DType::Bool, y.backend());
+			last_pred = et::zeros(y.shape(), et::DType::Bool, y.backend());
+		}
+		auto [pred, active] = tm->compute(y, last_active);
+		if(learn)
+			tm->learn(active, last_active);
+		anomaly = et::anomaly(last_pred, y);
+		last_pred = et::sum(pred, (intmax_t)pred.dimentions()-1).cast(et::DType::Bool);
+		last_active = active;
+		return y;
+	}
+
+	void reset()
+	{
+		last_active = et::Tensor();
+		last_pred = et::Tensor();
+		anomaly = 0;
+	}
+
+	et::SpatialPooler* sp;
+	et::TemporalMemory* tm;
+	bool learn;
+	float anomaly = 0;
+	et::Tensor last_active;
+	et::Tensor last_pred;
+};
+
+// Steps `region` over the first axis of `inputs`. The region's state is kept
+inline std::pair<et::Tensor, et::Tensor> runRegion(Region& region, const et::Tensor& inputs)
+{
+	intmax_t steps = inputs.shape()[0];
+	et::Tensor sdrs;
+	std::vector<float> scores;
+	for(intmax_t i=0;i<steps;i++) {
+		et::Tensor y = region.step(inputs.view({i}));
+		if(i == 0) {
+			et::Shape s = {steps};
+			for(auto d : y.shape())
+				s.push_back(d);
+			sdrs = et::zeros(s, et::DType::Bool, y.backend());
+		}
+		sdrs.view({i}).assign(y);
+		if(region.tm != nullptr)
+			scores.push_back(region.anomaly);
+	}
+	et::Tensor anomaly;
+	if(region.tm != nullptr)
+		anomaly = et::Tensor(et::Shape{steps}, scores.data(), sdrs.backend());
+	return {sdrs, anomaly};
+}
+
+inline std::pair<et::Tensor, et::Tensor> runSequence(et::SpatialPooler& sp, et::TemporalMemory* tm
+	, const et::Tensor& inputs, bool learn)
+{
+	Region region(&sp, tm, learn);
+	return runRegion(region, inputs);
+}
+
+}
+"""
+
+def install_algorithms():
+    cppyy.cppdef(algorithm_helpers)
+    release_gil(et.SpatialPooler.compute, et.SpatialPooler.learn, et.TemporalMemory.compute
+        , et.TemporalMemory.learn, etpy.Region.step, etpy.runRegion
+        , etpy.runSequence)
+    et.SpatialPooler.memory_report = memory.memory_report
+    et.TemporalMemory.memory_report = memory.memory_report
+dictionaries.on_load('algorithms', install_algorithms)
+
+# Helpers to run many models concurrently
+from . import parallel
+et.parallel = parallel
+
+# asyncio streaming
+from . import pipeline
+et.pipeline = pipeline
+
+# Streaming columnar files into the encoders
+try:
+    from . import io
+    et.io = io
+except ImportError: # requires numpy
+    pass
+
+# Opt-in profiling of the Python wrappers
+from .profiling import profile
+et.profile = profile
+
+import_time = time.perf_counter() - import_start
 
+# Seconds spent importing PyEtaler and loading each dictionary. Dictionaries
+# loaded lazily after the import are included once they are loaded
+def import_stats() -> dict:
+    return {'import': import_time, 'dictionaries': dict(dictionaries.load_times)}
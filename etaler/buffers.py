@@ -0,0 +1,64 @@
+# Recycling of host buffers used to receive tensor data (ex: t.numpy(out=pool)).
+# Allocating a new array every step churns the allocator and fragments memory.
+import threading
+
+import numpy as np
+
+class HostBufferPool:
+    # Free buffers are kept by dtype and number of elements. At most `max_bytes` worth
+    # of free buffers are kept, buffers released past that are left to the GC.
+    #  pool = et.HostBufferPool(max_bytes=64 << 20)
+    #  a = t.numpy(out=pool)
+    #  ...
+    #  pool.release(a) # a must not be used after this
+    def __init__(self, max_bytes: int=256 << 20):
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.max_bytes = max_bytes
+        self.nbytes = 0 # Bytes held by free buffers
+        self.high_water = 0
+        self.hits = 0
+        self.misses = 0
+        self._free = {}
+        self._lock = threading.Lock()
+
+    # A C-contiguous array of `shape` and `dtype`. Content is undefined
+    def get(self, shape, dtype) -> np.ndarray:
+        shape = tuple(int(s) for s in shape)
+        dtype = np.dtype(dtype)
+        key = (dtype.str, int(np.prod(shape, dtype=np.int64)))
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                array = free.pop()
+                self.nbytes -= array.nbytes
+                self.hits += 1
+                return array.reshape(shape)
+            self.misses += 1
+        return np.empty(shape, dtype=dtype)
+
+    # Return a buffer from get() to the pool
+    def release(self, array: np.ndarray):
+        if array.flags.c_contiguous is False or array.flags.writeable is False:
+            raise ValueError("Only C-contiguous, writeable arrays can be pooled")
+        key = (array.dtype.str, array.size)
+        with self._lock:
+            if self.nbytes + array.nbytes > self.max_bytes:
+                return
+            self._free.setdefault(key, []).append(array)
+            self.nbytes += array.nbytes
+            self.high_water = max(self.high_water, self.nbytes)
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self.nbytes = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'nbytes': self.nbytes
+                , 'high_water': self.high_water, 'max_bytes': self.max_bytes
+                , 'buffers': sum(len(v) for v in self._free.values())}
+
+    def __repr__(self):
+        return 'HostBufferPool(nbytes={}, max_bytes={})'.format(self.nbytes, self.max_bytes)
@@ -0,0 +1,137 @@
+# Incremental checkpoints for models that keep learning online (SpatialPooler,
+# TemporalMemory or anything with states()/loadState()). Between checkpoints only a
+# small part of the synapses change, so after a full base snapshot only the changed
+# elements of each tensor are written.
+#  ckpt = et.checkpoint.DeltaCheckpoint(sp, 'checkpoints/sp')
+#  ckpt.save() # the first call writes the base, later ones a delta against it
+#  ...
+#  et.checkpoint.restore(sp, 'checkpoints/sp')
+#
+# Deltas are always against the base, so restoring needs the base and the latest delta
+# only. The older deltas are removed once a new one is written. Files are written with
+# et.save. A changed tensor is stored as a nested StateDict of the flat indices and the
+# new values of the changed elements.
+import glob
+import os
+
+from . import et, etpy
+from .serialize import LazyStateDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+base_name = 'base'
+delta_format = 'delta-{:06d}'
+delta_keys = ('delta_indices', 'delta_values')
+
+class DeltaCheckpoint:
+    # A tensor with more than `max_delta_ratio` of its elements changed is stored in
+    # full. Once the deltas would hold more than `rebase_ratio` of all elements a new
+    # base is written instead (and the old deltas are removed).
+    # The base is kept on the host to diff against, that costs as much memory as the state
+    def __init__(self, model, directory: str, max_delta_ratio: float=0.25, rebase_ratio: float=0.5):
+        if np is None:
+            raise ImportError("Delta checkpoints require numpy")
+        self.model = model
+        self.directory = directory
+        self.max_delta_ratio = max_delta_ratio
+        self.rebase_ratio = rebase_ratio
+        self.base = None
+        self.num_deltas = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # Writes a checkpoint. Returns its path
+    def save(self) -> str:
+        if self.base is None:
+            return self.save_base()
+        state = self.model.states()
+        deltas = {}
+        unchanged = []
+        changed = 0
+        total = 0
+        for k, v in LazyStateDict(state).items():
+            if type(v) is not et.Tensor or k not in self.base:
+                continue
+            current = v.numpy()
+            base = self.base[k]
+            total += current.size
+            if current.shape != base.shape:
+                changed += current.size
+                continue
+            indices = np.flatnonzero(current != base)
+            if indices.size == 0:
+                unchanged.append(k)
+            elif indices.size <= self.max_delta_ratio * current.size:
+                deltas[k] = (indices.astype(np.int32), current.ravel()[indices])
+                changed += indices.size
+            else:
+                changed += current.size # stored in full
+        if total != 0 and changed > self.rebase_ratio * total:
+            return self.save_base(state)
+
+        for k in unchanged:
+            state.erase(k)
+        for k, (indices, values) in deltas.items():
+            delta = et.StateDict()
+            etpy.stateDictSet[et.Tensor](delta, delta_keys[0], et.Tensor.from_numpy(indices))
+            etpy.stateDictSet[et.Tensor](delta, delta_keys[1], et.Tensor.from_numpy(values))
+            etpy.stateDictSet[et.StateDict](state, k, delta)
+        self.num_deltas += 1
+        path = write(state, os.path.join(self.directory, delta_format.format(self.num_deltas)))
+        # The new delta has everything the older ones have. Only removed once it's in place
+        for delta in delta_paths(self.directory):
+            if delta != path:
+                os.remove(delta)
+        return path
+
+    # Writes a full snapshot and makes it the base of the following deltas
+    def save_base(self, state: et.StateDict=None) -> str:
+        state = self.model.states() if state is None else state
+        path = os.path.join(self.directory, base_name)
+        tmp = path + '.tmp'
+        et.save(state, tmp)
+        # The old deltas are removed before the new base is in place. A crash in between
+        # leaves the old base alone, never the new base with deltas against the old one
+        for delta in delta_paths(self.directory):
+            os.remove(delta)
+        os.replace(tmp, path)
+        self.base = {k: v.numpy() for k, v in LazyStateDict(state).items() if type(v) is et.Tensor}
+        self.num_deltas = 0
+        return path
+
+def write(state: et.StateDict, path: str) -> str:
+    # Never leave a half written checkpoint behind
+    tmp = path + '.tmp'
+    et.save(state, tmp)
+    os.replace(tmp, path)
+    return path
+
+def delta_paths(directory: str) -> list:
+    return sorted(glob.glob(os.path.join(directory, delta_format.replace('{:06d}', '[0-9]' * 6))))
+
+def is_delta(value) -> bool:
+    return isinstance(value, LazyStateDict) and all(k in value for k in delta_keys) and len(value) == 2
+
+# The state stored in `directory`: the base with the latest delta applied
+def load(directory: str) -> et.StateDict:
+    state = et.load(os.path.join(directory, base_name), lazy=True).state_dict
+    deltas = delta_paths(directory)
+    if len(deltas) == 0:
+        return state
+    delta = et.load(deltas[-1], lazy=True)
+    for k in delta:
+        value = delta[k]
+        if is_delta(value) is False:
+            # Copied natively, so the stored C++ type is kept
+            etpy.stateDictSet['std::any'](state, k, delta.state_dict.at(k))
+            continue
+        base = LazyStateDict(state)[k]
+        array = base.numpy()
+        array.ravel()[value[delta_keys[0]].numpy()] = value[delta_keys[1]].numpy()
+        etpy.stateDictSet[et.Tensor](state, k, et.Tensor.from_numpy(array, base.backend()))
+    return state
+
+def restore(model, directory: str):
+    model.loadState(load(directory))
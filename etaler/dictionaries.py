@@ -0,0 +1,116 @@
+# Loading of the reflection dictionaries generated by genbinding.py
+# The binding is split into several dictionaries. Only `core` is loaded at import,
+# the others are loaded the first time a name living in them is accessed. So short
+# lived processes only pay (in time and memory) for the parts of Etaler they use.
+import cppyy
+import os
+import time
+import types
+
+src_dir = os.path.dirname(os.path.realpath(__file__))
+
+dictionary_names = ('core', 'backends', 'encoders', 'algorithms')
+
+# Names under et:: and the dictionary they are declared in. Names not listed here
+# are searched in all dictionaries that are not loaded yet
+lazy_names = {
+    'encoder': 'encoders',
+    'CPUBackend': 'backends',
+    'OpenCLBackend': 'backends',
+    'SpatialPooler': 'algorithms',
+    'TemporalMemory': 'algorithms',
+    'anomaly': 'algorithms',
+}
+
+load_times = {}
+loaded = set()
+# Names found in none of the dictionaries. Looking them up again doesn't search anything
+absent = set()
+hooks = {name: [] for name in dictionary_names}
+
+def dictionary_path(name: str) -> str:
+    return os.path.join(src_dir, "etaler_{}_rflx.so".format(name))
+
+def load_dictionary(name: str):
+    if name in loaded:
+        return
+    start = time.perf_counter()
+    loaded.add(name)
+    path = dictionary_path(name)
+    if os.path.exists(path): # There's no dictionary if the group has no headers
+        cppyy.load_reflection_info(path)
+    load_times[name] = time.perf_counter() - start
+    for hook in hooks[name]:
+        hook()
+
+def load_core():
+    if os.path.exists(dictionary_path('core')):
+        load_dictionary('core')
+        return
+    # Binding generated with `genbinding.py --monolithic`. Everything is in one dictionary
+    start = time.perf_counter()
+    cppyy.load_reflection_info(os.path.join(src_dir, "etaler_rflx.so"))
+    loaded.update(dictionary_names)
+    load_times['monolithic'] = time.perf_counter() - start
+
+def load_pending() -> bool:
+    pending = [name for name in dictionary_names if name not in loaded]
+    for name in pending:
+        load_dictionary(name)
+    return len(pending) != 0
+
+# Run `hook` after the dictionary `name` is loaded. Python side patches for
+# things living in a lazy dictionary are installed this way
+def on_load(name: str, hook):
+    if name in loaded:
+        hook()
+    else:
+        hooks[name].append(hook)
+
+class LazyNamespace(types.ModuleType):
+    # Forwards attribute access to a cppyy namespace, loading dictionaries on demand.
+    # Found attributes are cached in the instance so further lookups are as fast as a
+    # module attribute.
+    def __init__(self, namespace):
+        super().__init__(namespace.__name__)
+        self.__dict__['_namespace'] = namespace
+
+    def __getattr__(self, name: str):
+        namespace = self.__dict__['_namespace']
+        if name in lazy_names:
+            load_dictionary(lazy_names[name])
+        elif name in absent:
+            raise AttributeError("namespace '{}' has no attribute '{}'".format(self.__name__, name))
+        try:
+            value = getattr(namespace, name)
+        except AttributeError:
+            if name.startswith('__'):
+                raise
+            if name in lazy_names or load_pending() is False:
+                absent.add(name)
+                raise
+            try:
+                value = getattr(namespace, name)
+            except AttributeError:
+                absent.add(name)
+                raise
+        self.__dict__[name] = value
+        return value
+
+    def __setattr__(self, name: str, value):
+        setattr(self.__dict__['_namespace'], name, value)
+        self.__dict__[name] = value
+        absent.discard(name)
+
+    def __dir__(self):
+        return dir(self.__dict__['_namespace'])
+
+# The attribute `name` of `namespace` if it's in a dictionary already loaded, None
+# otherwise. For optional lookups (ex: probing for an op) that must not load the
+# other dictionaries
+def find_loaded(namespace: LazyNamespace, name: str):
+    if name in namespace.__dict__:
+        return namespace.__dict__[name]
+    if name in absent:
+        return None
+    return getattr(namespace.__dict__['_namespace'], name, None)
@@ -0,0 +1,126 @@
+# DLPack exchange with other array libraries (PyTorch, JAX, CuPy, numpy, ...).
+# Exporting (t.__dlpack__) shares the tensor's memory. The DLManagedTensor keeps a
+# reference to the tensor until the consumer calls its deleter. So the memory stays
+# valid while either side uses it. Only tensors on the CPU backend can be exported.
+# Importing (et.from_dlpack) makes one copy since Etaler tensors own their storage.
+#  x = torch.from_dlpack(t)  # no copy
+#  t = et.from_dlpack(x)     # one memcpy into Etaler
+import ctypes
+
+import numpy as np
+
+from . import et, etpy
+
+# Constants from dlpack.h
+kDLCPU = 1
+kDLOpenCL = 4
+kDLInt = 0
+kDLFloat = 2
+kDLBool = 6
+
+class DLDevice(ctypes.Structure):
+    _fields_ = [('device_type', ctypes.c_int), ('device_id', ctypes.c_int)]
+
+class DLDataType(ctypes.Structure):
+    _fields_ = [('code', ctypes.c_uint8), ('bits', ctypes.c_uint8), ('lanes', ctypes.c_uint16)]
+
+class DLTensor(ctypes.Structure):
+    _fields_ = [
+        ('data', ctypes.c_void_p),
+        ('device', DLDevice),
+        ('ndim', ctypes.c_int),
+        ('dtype', DLDataType),
+        ('shape', ctypes.POINTER(ctypes.c_int64)),
+        ('strides', ctypes.POINTER(ctypes.c_int64)),
+        ('byte_offset', ctypes.c_uint64),
+    ]
+
+class DLManagedTensor(ctypes.Structure):
+    pass
+
+DLDeleter = ctypes.CFUNCTYPE(None, ctypes.POINTER(DLManagedTensor))
+DLManagedTensor._fields_ = [
+    ('dl_tensor', DLTensor),
+    ('manager_ctx', ctypes.c_void_p),
+    ('deleter', DLDeleter),
+]
+
+capsule_name = b'dltensor'
+
+PyCapsule_Destructor = ctypes.CFUNCTYPE(None, ctypes.c_void_p)
+PyCapsule_New = ctypes.pythonapi.PyCapsule_New
+PyCapsule_New.restype = ctypes.py_object
+PyCapsule_New.argtypes = [ctypes.c_void_p, ctypes.c_char_p, PyCapsule_Destructor]
+PyCapsule_IsValid = ctypes.pythonapi.PyCapsule_IsValid
+PyCapsule_IsValid.restype = ctypes.c_int
+PyCapsule_IsValid.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+PyCapsule_GetPointer = ctypes.pythonapi.PyCapsule_GetPointer
+PyCapsule_GetPointer.restype = ctypes.c_void_p
+PyCapsule_GetPointer.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+
+dl_dtypes = {
+    int(et.DType.Bool): (kDLBool, 8),
+    int(et.DType.Int32): (kDLInt, 32),
+    int(et.DType.Float): (kDLFloat, 32),
+    int(et.DType.Half): (kDLFloat, 16),
+}
+
+# Exported tensors, keyed by the address of their DLManagedTensor. Holds the tensor,
+# its shape array and the struct itself until the deleter runs
+_exported = {}
+
+@DLDeleter
+def managed_deleter(managed):
+    _exported.pop(ctypes.addressof(managed.contents), None)
+
+@PyCapsule_Destructor
+def capsule_destructor(capsule):
+    # The consumer renames the capsule once it takes ownership. If it still has the
+    # original name it was never consumed, so it's freed here
+    if PyCapsule_IsValid(capsule, capsule_name):
+        address = PyCapsule_GetPointer(capsule, capsule_name)
+        _exported.pop(address, None)
+
+def tensor_dlpack_device(self: et.Tensor) -> tuple:
+    name = str(self.backend().name())
+    if name == 'CPU':
+        return (kDLCPU, 0)
+    elif name == 'OpenCL':
+        return (kDLOpenCL, 0)
+    raise BufferError("Backend {} has no DLPack device".format(name))
+
+def tensor_dlpack(self: et.Tensor, stream=None, max_version=None, dl_device=None, copy=None):
+    if str(self.backend().name()) != 'CPU':
+        raise BufferError("Only tensors on the CPU backend can be exported with DLPack")
+    if dl_device is not None and tuple(dl_device) != (kDLCPU, 0):
+        raise BufferError("Tensors can only be exported to the CPU")
+    if copy is True or etpy.hostAddress(self) == 0:
+        if copy is False:
+            raise BufferError("Views must be copied to be exported")
+        t = self.copy() # Views are made contiguous
+    else:
+        t = self
+    meta = t.read_meta()
+    code, bits = dl_dtypes[int(meta.dtype)]
+    shape = (ctypes.c_int64 * max(1, meta.ndim))(*meta.shape)
+
+    managed = DLManagedTensor()
+    managed.dl_tensor.data = etpy.hostAddress(t)
+    managed.dl_tensor.device = DLDevice(kDLCPU, 0)
+    managed.dl_tensor.ndim = meta.ndim
+    managed.dl_tensor.dtype = DLDataType(code, bits, 1)
+    managed.dl_tensor.shape = ctypes.cast(shape, ctypes.POINTER(ctypes.c_int64))
+    managed.dl_tensor.strides = None # compact, row-major
+    managed.dl_tensor.byte_offset = 0
+    managed.manager_ctx = None
+    managed.deleter = managed_deleter
+
+    address = ctypes.addressof(managed)
+    _exported[address] = (t, shape, managed)
+    return PyCapsule_New(address, capsule_name, capsule_destructor)
+
+# A tensor (on `backend`) with a copy of the content of any DLPack exporting object
+def from_dlpack(obj, backend=None) -> et.Tensor:
+    if hasattr(np, 'from_dlpack') is False:
+        raise ImportError("et.from_dlpack requires numpy >= 1.22")
+    return et.Tensor.from_numpy(np.from_dlpack(obj), backend)
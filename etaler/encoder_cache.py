@@ -0,0 +1,98 @@
+# LRU cache for deterministic encoders (scalar, gridCell1d, gridCell2d, ...)
+# Encoding the same value with the same parameters always produces the same SDR.
+# So streams with repeating values can skip the encoder entirely.
+from collections import OrderedDict
+import numbers
+import threading
+
+from . import et, dtype_size
+
+def quantize_key(value, quantum: float):
+    # Floats are quantized so values that differ by less than `quantum` share an entry
+    if isinstance(value, bool) or isinstance(value, numbers.Integral):
+        return value
+    elif isinstance(value, numbers.Real):
+        return ('f', round(float(value) / quantum))
+    elif isinstance(value, (tuple, list)):
+        return tuple(quantize_key(v, quantum) for v in value)
+    elif hasattr(value, 'tolist') and hasattr(value, 'shape'): # numpy arrays and scalars
+        return quantize_key(value.tolist(), quantum)
+    return value # Everything else (ex: backends) is compared by identity/equality
+
+class EncoderCache:
+    def __init__(self, encoder, max_entries: int=1024, max_bytes: int=None, quantum: float=1e-6):
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        if quantum <= 0:
+            raise ValueError("quantum must be positive")
+        self.encoder = encoder
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.quantum = quantum
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs) -> et.Tensor:
+        key = (quantize_key(args, self.quantum), quantize_key(sorted(kwargs.items()), self.quantum))
+        try:
+            hash(key)
+        except TypeError: # Can't cache with unhashable parameters
+            with self._lock:
+                self.misses += 1
+            return self.encoder(*args, **kwargs)
+
+        with self._lock:
+            sdr = self._entries.get(key)
+            if sdr is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Tensors are handles. Return a copy so the cached SDR can't be modified
+                return sdr.copy()
+            self.misses += 1
+
+        sdr = self.encoder(*args, **kwargs)
+        size = sdr.size() * dtype_size(sdr.dtype())
+        if self.max_bytes is not None and size > self.max_bytes:
+            return sdr
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = sdr.copy()
+                self.nbytes += size
+            self._evict()
+        return sdr
+
+    def _evict(self):
+        while len(self._entries) != 0 and ((self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            _, sdr = self._entries.popitem(last=False)
+            self.nbytes -= sdr.size() * dtype_size(sdr.dtype())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self.nbytes
+            , 'max_entries': self.max_entries, 'max_bytes': self.max_bytes}
+
+    def __repr__(self):
+        return 'EncoderCache(hits={hits}, misses={misses}, entries={entries}, bytes={bytes})'.format(**self.info())
+
+# Wrap an encoder with an EncoderCache. Can also be used as a decorator
+#  gc = et.encoder.cached(et.encoder.gridCell1d, max_entries=4096)
+#  @et.encoder.cached(max_bytes=2**20)
+#  def encode(x): ...
+def cached(encoder=None, max_entries: int=1024, max_bytes: int=None, quantum: float=1e-6):
+    if encoder is None:
+        return lambda f: EncoderCache(f, max_entries, max_bytes, quantum)
+    return EncoderCache(encoder, max_entries, max_bytes, quantum)
@@ -0,0 +1,159 @@
+# Streaming columnar data (memory-mapped .npy files or Arrow IPC files) into the
+# batch encoders and models. Only one chunk of rows is read into memory at a time, so
+# peak memory doesn't depend on the size of the dataset.
+#  reader = et.io.open('history.npy', chunk_rows=4096)
+#  encoder = functools.partial(et.encoder.scalarBatch, min=0, max=100
+#      , result_sdr_length=1024, num_active_bits=40)
+#  for sdrs, scores in et.io.run(reader, encoder, sp, tm):
+#      ...
+# Arrow files require pyarrow.
+from collections.abc import Mapping
+import os
+
+import numpy as np
+
+from .parallel import Region
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+arrow_extensions = ('.arrow', '.arrows', '.feather', '.ipc')
+
+# Columns of memory-mapped numpy arrays. Either a single .npy file (1D, 2D where the
+# columns are the indices of the 2nd axis, or a structured array) or a dict of 1D
+# .npy files with the same length
+class NpySource:
+    def __init__(self, source):
+        if isinstance(source, Mapping):
+            self.arrays = {name: load_npy(path) for name, path in source.items()}
+            lengths = set(len(a) for a in self.arrays.values())
+            if len(lengths) > 1:
+                raise ValueError("All columns must have the same length")
+            self.columns = list(self.arrays)
+            self.array = None
+            return
+        self.array = load_npy(source)
+        self.arrays = None
+        if self.array.dtype.names is not None:
+            self.columns = list(self.array.dtype.names)
+        elif self.array.ndim == 1:
+            self.columns = [0]
+        elif self.array.ndim == 2:
+            self.columns = list(range(self.array.shape[1]))
+        else:
+            raise ValueError("Expecting a 1D or 2D array, got {} dimensions".format(self.array.ndim))
+
+    def __len__(self) -> int:
+        return len(self.array) if self.array is not None else len(next(iter(self.arrays.values())))
+
+    def column(self, name, start: int, stop: int) -> np.ndarray:
+        if self.arrays is not None:
+            return self.arrays[name][start:stop]
+        elif self.array.dtype.names is not None:
+            return self.array[start:stop][name]
+        elif self.array.ndim == 1:
+            return self.array[start:stop]
+        return self.array[start:stop, name]
+
+    def chunks(self, columns: list, chunk_rows: int):
+        n = len(self)
+        for start in range(0, n, chunk_rows):
+            stop = min(start + chunk_rows, n)
+            yield {c: self.column(c, start, stop) for c in columns}
+
+def load_npy(source) -> np.ndarray:
+    if isinstance(source, np.ndarray):
+        return source
+    return np.load(source, mmap_mode='r')
+
+# Columns of a memory-mapped Arrow IPC file (or stream). Chunks never span record
+# batches, so they can be shorter than `chunk_rows` at the end of a batch
+class ArrowSource:
+    def __init__(self, path: str):
+        if pyarrow is None:
+            raise ImportError("Reading Arrow files requires pyarrow")
+        self.path = path
+        with pyarrow.memory_map(path, 'r') as source:
+            self.columns = list(open_reader(source).schema.names)
+
+    # The mapping (and the reader) are closed once the batches are exhausted or the
+    # generator is closed. Zero-copy columns keep the mapped memory alive on their own
+    def batches(self):
+        with pyarrow.memory_map(self.path, 'r') as source:
+            reader = open_reader(source)
+            try:
+                if hasattr(reader, 'num_record_batches'):
+                    for i in range(reader.num_record_batches):
+                        yield reader.get_batch(i)
+                else:
+                    yield from reader
+            finally:
+                if hasattr(reader, 'close'):
+                    reader.close()
+
+    def chunks(self, columns: list, chunk_rows: int):
+        for batch in self.batches():
+            for start in range(0, batch.num_rows, chunk_rows):
+                chunk = batch.slice(start, chunk_rows)
+                yield {c: column_to_numpy(chunk.column(c)) for c in columns}
+
+def open_reader(source):
+    try:
+        return pyarrow.ipc.open_file(source)
+    except pyarrow.ArrowInvalid: # stream format
+        source.seek(0)
+        return pyarrow.ipc.open_stream(source)
+
+def column_to_numpy(column) -> np.ndarray:
+    try: # a view of the mapped file for primitive columns without nulls
+        return column.to_numpy(zero_copy_only=True)
+    except pyarrow.ArrowInvalid:
+        return column.to_numpy(zero_copy_only=False)
+
+def open_source(source):
+    if isinstance(source, (str, os.PathLike)) and str(source).endswith(arrow_extensions):
+        return ArrowSource(str(source))
+    return NpySource(source)
+
+class ColumnReader:
+    # Iterates over chunks of at most `chunk_rows` rows of `columns` (all by default).
+    # A chunk is a numpy array for a single column, a [rows, columns] array if `stack`
+    # is set (ex: for et.encoder.gridCell2dBatch) and a dict of arrays otherwise
+    def __init__(self, source, columns=None, chunk_rows: int=4096, stack: bool=False):
+        if chunk_rows <= 0:
+            raise ValueError("chunk_rows must be positive")
+        self.source = open_source(source)
+        self.columns = list(columns) if columns is not None else self.source.columns
+        missing = [c for c in self.columns if c not in self.source.columns]
+        if len(missing) != 0:
+            raise KeyError("Columns {} not found. Available columns are {}".format(missing, self.source.columns))
+        self.chunk_rows = chunk_rows
+        self.stack = stack
+
+    def __iter__(self):
+        for chunk in self.source.chunks(self.columns, self.chunk_rows):
+            if self.stack:
+                yield np.stack([chunk[c] for c in self.columns], axis=-1)
+            elif len(self.columns) == 1:
+                yield chunk[self.columns[0]]
+            else:
+                yield chunk
+
+def open(source, columns=None, chunk_rows: int=4096, stack: bool=False) -> ColumnReader:
+    return ColumnReader(source, columns, chunk_rows, stack)
+
+# Encodes each chunk with `encoder` (ex: the et.encoder.*Batch functions)
+def encode(reader, encoder):
+    for chunk in reader:
+        yield encoder(chunk)
+
+# Runs the encoded chunks through `sp` (and `tm`). Yields the SpatialPooler's output
+# and the anomaly scores (None without a TemporalMemory) of each chunk. The TemporalMemory's
+# state is kept across chunks
+def run(reader, encoder, sp, tm=None, learn: bool=True):
+    region = Region(sp, tm, learn)
+    for x in encode(reader, encoder):
+        yield region.run(x)
@@ -0,0 +1,92 @@
+# Memory accounting of tensors and models, and compact (quantized) snapshots of
+# the permanences, which are the bulk of a SpatialPooler's/TemporalMemory's memory.
+from . import et, etpy, dtype_size
+from .serialize import LazyStateDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def tensor_bytes(t: et.Tensor) -> int:
+    if t.has_value() is False:
+        return 0
+    return t.size() * dtype_size(t.dtype())
+
+# Bytes used by a tensor or a model (anything with states(), ex: SpatialPooler and
+# TemporalMemory). Returns {'total': bytes, 'components': {name: bytes}, 'backends': {name: bytes}}
+# Views are counted by the elements they see, not by the storage they share
+def memory_report(obj) -> dict:
+    if type(obj) is et.Tensor:
+        components = {'tensor': obj}
+    else:
+        states = LazyStateDict(obj.states())
+        components = {k: v for k, v in states.items() if type(v) is et.Tensor}
+    report = {'total': 0, 'components': {}, 'backends': {}}
+    for name, t in components.items():
+        nbytes = tensor_bytes(t)
+        report['components'][name] = nbytes
+        report['total'] += nbytes
+        if nbytes != 0:
+            backend = str(t.backend().name())
+            report['backends'][backend] = report['backends'].get(backend, 0) + nbytes
+    return report
+
+# Precision of the stored permanences: 'half' keeps them as a Half tensor on the same
+# backend, 'int8' as 8-bit fixed point (round(p*255)) numpy arrays on the host
+precisions = ('half', 'int8')
+
+# A snapshot of a model with the permanences quantized. Etaler computes with Float
+# permanences, so a model must be restored (restore_state) before it is used again
+class CompactState:
+    def __init__(self, state: et.StateDict, permanences: dict, backends: dict, precision: str):
+        self.state = state # Everything except the permanences, as stored by the model
+        self.permanences = permanences
+        self.backends = backends
+        self.precision = precision
+
+    @property
+    def nbytes(self) -> int:
+        res = sum(v.nbytes if np is not None and isinstance(v, np.ndarray) else tensor_bytes(v)
+            for v in self.permanences.values())
+        state = LazyStateDict(self.state)
+        return res + sum(tensor_bytes(v) for v in state.values() if type(v) is et.Tensor)
+
+    def __repr__(self):
+        return 'CompactState(precision={}, nbytes={})'.format(self.precision, self.nbytes)
+
+def is_permanence(key: str, value) -> bool:
+    return 'permanence' in key and type(value) is et.Tensor and value.dtype() == et.DType.Float
+
+def compact_state(model, precision: str='half') -> CompactState:
+    if precision not in precisions:
+        raise ValueError("precision must be one of {}".format(precisions))
+    if precision == 'int8' and np is None:
+        raise ImportError("8-bit permanences require numpy")
+    state = model.states()
+    permanences = {}
+    backends = {}
+    for k, v in LazyStateDict(state).items():
+        if is_permanence(k, v) is False:
+            continue
+        if precision == 'half':
+            permanences[k] = v.cast(et.DType.Half)
+        else:
+            permanences[k] = np.rint(np.clip(v.numpy(), 0, 1) * 255).astype(np.uint8)
+        backends[k] = v.backend()
+    for k in permanences:
+        state.erase(k)
+    # The remaining tensors (ex: the TemporalMemory's connections) are the model's own
+    # and would change as it keeps learning
+    return CompactState(etpy.snapshotStateDict(state), permanences, backends, precision)
+
+# Loads a CompactState into `model` (of the same configuration as the one it's from)
+def restore_state(model, compact: CompactState):
+    state = etpy.snapshotStateDict(compact.state) # so it can be restored again
+    for k, v in compact.permanences.items():
+        if compact.precision == 'half':
+            p = v.cast(et.DType.Float)
+        else:
+            p = et.Tensor.from_numpy(v.astype(np.float32) * np.float32(1 / 255), compact.backends[k])
+        etpy.stateDictSet[et.Tensor](state, k, p)
+    model.loadState(state)
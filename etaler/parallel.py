@@ -0,0 +1,275 @@
+# Running many independent HTM models concurrently. The heavy native calls release
+# the GIL, so regions stepped on different threads run in parallel. ProcessRegionPool
+# shards the models across processes instead.
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import os
+import tempfile
+import traceback
+
+from . import et, etpy
+
+try:
+    import numpy as np
+except ImportError: # Only needed by ProcessRegionPool
+    np = None
+
+def as_tensor(x) -> et.Tensor:
+    return x if type(x) is et.Tensor else et.Tensor.from_numpy(x)
+
+# A SpatialPooler optionally followed by a TemporalMemory. The TemporalMemory's
+# state is kept between steps.
+class Region:
+    def __init__(self, sp, tm=None, learn: bool=True):
+        # The native region only holds pointers. Keep the models alive
+        self.sp = sp
+        self.tm = tm
+        self.native = etpy.Region(sp, tm, learn)
+
+    @property
+    def learn(self) -> bool:
+        return self.native.learn
+
+    @learn.setter
+    def learn(self, value: bool):
+        self.native.learn = value
+
+    # Returns the SpatialPooler's output and the anomaly score (None without a TemporalMemory)
+    def step(self, x):
+        y = self.native.step(as_tensor(x))
+        return y, (float(self.native.anomaly) if self.tm is not None else None)
+
+    # Steps over the first axis of `inputs`. Returns the stacked outputs and the anomaly
+    # scores (None without a TemporalMemory). Unlike et.run_sequence the state is kept
+    def run(self, inputs):
+        y, scores = etpy.runRegion(self.native, as_tensor(inputs))
+        return y, (scores if self.tm is not None else None)
+
+    def reset(self):
+        self.native.reset()
+
+# Steps many independent regions concurrently on a thread pool.
+#  pool = et.parallel.RegionPool([(sp1, tm1), (sp2, tm2), sp3])
+#  results = pool.step([x1, x2, x3]) # [(sdr, anomaly), ...]
+class RegionPool:
+    def __init__(self, regions, max_workers: int=None, learn: bool=True):
+        self.regions = [make_region(r, learn) for r in regions]
+        self.executor = ThreadPoolExecutor(max_workers if max_workers is not None else os.cpu_count())
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def step(self, inputs) -> list:
+        if len(inputs) != len(self.regions):
+            raise ValueError("Expecting {} inputs, got {}".format(len(self.regions), len(inputs)))
+        futures = [self.executor.submit(r.step, x) for r, x in zip(self.regions, inputs)]
+        return [f.result() for f in futures]
+
+    # Run a whole sequence through each region using et.run_sequence. The TemporalMemory
+    # starts from a clean state for each sequence
+    def run(self, sequences, anomaly: bool=False) -> list:
+        if len(sequences) != len(self.regions):
+            raise ValueError("Expecting {} sequences, got {}".format(len(self.regions), len(sequences)))
+        futures = [self.executor.submit(et.run_sequence, r.sp, r.tm, x, r.learn, anomaly)
+            for r, x in zip(self.regions, sequences)]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def make_region(r, learn: bool) -> Region:
+    if isinstance(r, Region):
+        return r
+    elif isinstance(r, tuple):
+        return Region(*r, learn=learn)
+    return Region(r, learn=learn)
+
+# Process based pool. cppyy objects can't be pickled, so the models are built by
+# `factory(model_index)` (a picklable callable returning a SpatialPooler, a (sp, tm)
+# tuple or a Region) and owned by the worker processes. Input batches are passed
+# through shared memory. Outputs come back as et.SDR (only the active bits).
+#  pool = et.parallel.ProcessRegionPool(make_model, num_models=256, num_workers=8)
+#  x = pool.input_buffer((256, 1024), np.bool_) # fill it in-place to avoid a copy
+#  results = pool.step(x) # [(sdr, anomaly), ...]
+class ProcessRegionPool:
+    def __init__(self, factory, num_models: int, num_workers: int=None, learn: bool=True):
+        num_workers = min(num_models, num_workers if num_workers is not None else os.cpu_count())
+        # Forking a process with cling already initialized is not safe
+        ctx = multiprocessing.get_context('spawn')
+        self.num_models = num_models
+        self.buffer = None
+        self.shm = None
+        self.connections = []
+        self.processes = []
+        for w in range(num_workers):
+            parent_conn, child_conn = ctx.Pipe()
+            model_ids = list(range(w, num_models, num_workers))
+            p = ctx.Process(target=worker_main, args=(child_conn, factory, model_ids, learn), daemon=True)
+            p.start()
+            self.connections.append(parent_conn)
+            self.processes.append(p)
+        self.owner = {i: self.connections[i % num_workers] for i in range(num_models)}
+        try:
+            for conn in self.connections:
+                self.receive(conn) # wait until the models are built
+        except BaseException:
+            self.close() # the caller never gets a pool to close
+            raise
+
+    def __len__(self) -> int:
+        return self.num_models
+
+    @staticmethod
+    def receive(conn):
+        status, payload = conn.recv()
+        if status == 'error':
+            raise RuntimeError("Worker failed:\n" + payload)
+        return payload
+
+    # A numpy array backed by shared memory. Batches written into it are not copied by step()
+    def input_buffer(self, shape, dtype) -> np.ndarray:
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        if self.buffer is not None and self.buffer.shape == shape and self.buffer.dtype == dtype:
+            return self.buffer
+        nbytes = max(1, int(np.prod(shape)) * dtype.itemsize)
+        if self.shm is None or self.shm.size < nbytes:
+            from multiprocessing import shared_memory # Python 3.8+
+            self.release_shm()
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.buffer = np.ndarray(shape, dtype, buffer=self.shm.buf)
+        return self.buffer
+
+    # `batch` is of shape [num_models, ...]. Row i is fed to model i
+    def step(self, batch) -> list:
+        if len(batch) != self.num_models:
+            raise ValueError("Expecting a batch of {} inputs, got {}".format(self.num_models, len(batch)))
+        if batch is not self.buffer:
+            batch = np.asarray(batch)
+            self.input_buffer(batch.shape, batch.dtype)[...] = batch
+        args = (self.shm.name, self.buffer.shape, self.buffer.dtype.str)
+        for conn in self.connections:
+            conn.send(('step', args))
+        results = [None] * self.num_models
+        errors = []
+        for conn in self.connections: # every reply is read, so the pipes stay in sync
+            status, payload = conn.recv()
+            if status == 'error':
+                errors.append(payload)
+                continue
+            for i, sdr, score in payload:
+                results[i] = (sdr, score)
+        if len(errors) != 0:
+            raise RuntimeError("Worker failed:\n" + '\n'.join(errors))
+        return results
+
+    # The state of a model. Written straight to `path` by the worker if given (and
+    # the path is returned). Otherwise it is sent back and returned as a dict like et.load does
+    def snapshot(self, model: int, path: str=None):
+        if path is not None:
+            self.owner[model].send(('snapshot', (model, path)))
+            self.receive(self.owner[model])
+            return path
+        self.owner[model].send(('snapshot', (model, None)))
+        data = self.receive(self.owner[model])
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'state')
+            with open(path, 'wb') as f:
+                f.write(data)
+            return et.load(path)
+
+    def release_shm(self):
+        self.buffer = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for p in self.processes:
+            p.join()
+        for conn in self.connections:
+            conn.close()
+        self.connections = []
+        self.processes = []
+        self.release_shm()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def attach_shm(name: str):
+    from multiprocessing import shared_memory
+    try: # Python 3.13+. Only the creator should track (and unlink) the memory
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+def model_states(region: Region) -> et.StateDict:
+    state = et.StateDict()
+    state['sp'] = region.sp.states()
+    if region.tm is not None:
+        state['tm'] = region.tm.states()
+    return state
+
+# The view of the shared memory is dropped on return, so the mapping can be closed later
+def step_models(regions: dict, model_ids: list, shm, shape, dtype) -> list:
+    from .sdr import SDR
+    batch = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+    res = []
+    for i in model_ids:
+        y, score = regions[i].step(batch[i])
+        res.append((i, SDR.from_tensor(y), score))
+    return res
+
+def worker_main(conn, factory, model_ids, learn):
+    try:
+        regions = {i: make_region(factory(i), learn) for i in model_ids}
+        conn.send(('ok', None))
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+        return
+
+    shm = None # The pool's current input buffer. Replaced when it's reallocated
+    while True:
+        cmd, args = conn.recv()
+        if cmd == 'close':
+            break
+        try:
+            if cmd == 'step':
+                name, shape, dtype = args
+                if shm is None or shm.name != name:
+                    if shm is not None:
+                        shm.close()
+                    shm = attach_shm(name)
+                conn.send(('ok', step_models(regions, model_ids, shm, shape, dtype)))
+            elif cmd == 'snapshot':
+                model, path = args
+                if path is not None:
+                    et.save(model_states(regions[model]), path)
+                    conn.send(('ok', None))
+                else:
+                    with tempfile.TemporaryDirectory() as d:
+                        tmp = os.path.join(d, 'state')
+                        et.save(model_states(regions[model]), tmp)
+                        with open(tmp, 'rb') as f:
+                            conn.send(('ok', f.read()))
+            else:
+                raise ValueError("Unknown command {}".format(cmd))
+        except Exception:
+            conn.send(('error', traceback.format_exc()))
+    if shm is not None:
+        shm.close()
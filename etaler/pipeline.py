@@ -0,0 +1,132 @@
+# asyncio streaming of raw values through encoder -> SpatialPooler -> TemporalMemory.
+# Values are grouped into micro-batches which are run on an executor, so the event
+# loop is never blocked by Etaler (the native calls release the GIL).
+#  stream = et.pipeline.Stream([functools.partial(et.encoder.scalarBatch, min=0, max=1
+#      , result_sdr_length=128, num_active_bits=12), sp, tm])
+#  async for sdr, score in stream(values): # values is an async iterable
+#      ...
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .parallel import Region
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Marks the end of the input in the queues
+_end = object()
+
+class Stream:
+    # `stages` is [encoder, sp] or [encoder, sp, tm]. The encoder is called with a numpy
+    # array of a batch of values and must return a tensor of shape [batch, ...] (ex: the
+    # et.encoder.*Batch functions). A batch is run once it has `max_batch` values or its
+    # first value waited for `max_latency` seconds. At most `max_queue` batches are kept
+    # in flight, after that the source isn't read until the consumer catches up.
+    def __init__(self, stages, max_batch: int=64, max_latency: float=0.01, max_queue: int=4
+        , learn: bool=True, executor=None):
+        if len(stages) not in (2, 3):
+            raise ValueError("Expecting [encoder, sp] or [encoder, sp, tm] as stages")
+        if max_batch < 1 or max_queue < 1:
+            raise ValueError("max_batch and max_queue must be at least 1")
+        self.encoder = stages[0]
+        self.region = Region(*stages[1:], learn=learn)
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.max_queue = max_queue
+        # Batches must run in order (the TemporalMemory is stateful). One thread is enough
+        self.executor = executor if executor is not None else ThreadPoolExecutor(1, thread_name_prefix='etaler-stream')
+
+    def __call__(self, source):
+        return self.run(source)
+
+    # Runs a batch of raw values. Returns a list of (sdr, anomaly score or None)
+    def process(self, values: list) -> list:
+        x = self.encoder(np.asarray(values))
+        y, scores = self.region.run(x)
+        scores = scores.tolist() if scores is not None else [None] * len(values)
+        return [(y[i], s) for i, s in enumerate(scores)]
+
+    async def run(self, source):
+        items = asyncio.Queue(self.max_batch)
+        batches = asyncio.Queue(self.max_queue)
+        results = asyncio.Queue(self.max_queue)
+        tasks = [asyncio.ensure_future(f) for f in (self.read(source, items)
+            , self.batch(items, batches), self.compute(batches, results))]
+        try:
+            while True:
+                res = await results.get()
+                if res is _end:
+                    break
+                if isinstance(res, BaseException):
+                    raise res
+                for r in res:
+                    yield r
+        finally:
+            for t in tasks:
+                t.cancel()
+            # Wait for the cancellations, so no task is destroyed while pending
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def read(self, source, items: asyncio.Queue):
+        try:
+            async for x in source:
+                await items.put(x)
+            await items.put(_end)
+        except Exception as e:
+            await items.put(e)
+
+    async def batch(self, items: asyncio.Queue, batches: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        # A get() cancelled by a timeout can lose its item (asyncio.wait_for before
+        # Python 3.12). So one pending get() is kept across the batches instead
+        pending = None
+        try:
+            while True:
+                x = await (pending if pending is not None else items.get())
+                pending = None
+                if x is _end or isinstance(x, BaseException):
+                    await batches.put(x)
+                    return
+                batch = [x]
+                deadline = loop.time() + self.max_latency
+                while len(batch) < self.max_batch:
+                    pending = asyncio.ensure_future(items.get())
+                    done, _ = await asyncio.wait([pending], timeout=max(0, deadline - loop.time()))
+                    if len(done) == 0:
+                        break # the item is taken by the next batch
+                    x = pending.result()
+                    pending = None
+                    if x is _end or isinstance(x, BaseException):
+                        await batches.put(batch)
+                        await batches.put(x)
+                        return
+                    batch.append(x)
+                await batches.put(batch)
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def compute(self, batches: asyncio.Queue, results: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await batches.get()
+            if batch is _end or isinstance(batch, BaseException):
+                await results.put(batch)
+                return
+            try:
+                res = await loop.run_in_executor(self.executor, self.process, batch)
+            except Exception as e:
+                await results.put(e)
+                return
+            await results.put(res)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
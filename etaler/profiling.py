@@ -0,0 +1,199 @@
+# Opt-in instrumentation of PyEtaler. Separates the time spent in the Python shims
+# (indexing, toHost, numpy conversions, etc..) from the time spent in Etaler's native
+# code, and counts the bytes copied between Python and Etaler. The shims are only
+# wrapped while a profile is active, so there is no cost when profiling is disabled.
+#  with et.profile(trace=True) as prof:
+#      ...
+#  print(prof.summary())
+#  prof.export_chrome_trace('trace.json') # open in chrome://tracing or Perfetto
+from collections import namedtuple
+import importlib
+import json
+import threading
+import time
+
+from . import et, etpy
+
+# Per function statistics. `native` is the time spent in native calls made by the
+# function, so `total - native` is the Python overhead of a wrapper
+class Stat:
+    __slots__ = ('calls', 'total', 'native')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.native = 0.0
+
+    @property
+    def overhead(self) -> float:
+        return self.total - self.native
+
+    def __repr__(self):
+        return 'Stat(calls={}, total={:.6f}, native={:.6f})'.format(self.calls, self.total, self.native)
+
+# A function to instrument. `target` is a class, namespace, module or dict
+Hook = namedtuple('Hook', ['name', 'category', 'target', 'attr', 'nbytes'])
+
+_active = None
+
+class Profile:
+    def __init__(self, trace: bool=False):
+        self.trace = trace
+        self.stats = {}
+        # Bytes copied from Etaler to Python ('to_host') and from Python to Etaler ('from_host')
+        self.transfer_bytes = {'to_host': 0, 'from_host': 0}
+        # Number of toHost() copies for each DType
+        self.to_host_copies = {}
+        self.events = []
+        self.start_time = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.patched = []
+
+    def __enter__(self):
+        global _active
+        if _active is not None:
+            raise RuntimeError("Another profile is already active")
+        _active = self
+        self.start_time = time.perf_counter()
+        for hook in hooks():
+            self.patch(hook)
+        return self
+
+    def __exit__(self, *args):
+        global _active
+        for target, attr, original in reversed(self.patched):
+            set_attr(target, attr, original)
+        self.patched = []
+        _active = None
+
+    def patch(self, hook: Hook):
+        original = get_attr(hook.target, hook.attr)
+        if original is None:
+            return
+        func = original.__func__ if isinstance(original, staticmethod) else original
+        wrapped = self.wrap(hook, func)
+        set_attr(hook.target, hook.attr, staticmethod(wrapped) if isinstance(original, staticmethod) else wrapped)
+        self.patched.append((hook.target, hook.attr, original))
+
+    def wrap(self, hook: Hook, func):
+        def wrapper(*args, **kwargs):
+            stack = self.stack()
+            frame = [0.0] # Time spent in nested native calls
+            stack.append(frame)
+            start = time.perf_counter()
+            try:
+                res = func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+            if stack:
+                stack[-1][0] += elapsed if hook.category == 'native' else frame[0]
+            nbytes = hook.nbytes(args, res) if hook.nbytes is not None else None
+            self.record(hook, start, elapsed, frame[0], nbytes)
+            return res
+        return wrapper
+
+    def stack(self) -> list:
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def record(self, hook: Hook, start: float, elapsed: float, native: float, nbytes):
+        with self.lock:
+            stat = self.stats.get(hook.name)
+            if stat is None:
+                stat = self.stats[hook.name] = Stat()
+            stat.calls += 1
+            stat.total += elapsed
+            stat.native += elapsed if hook.category == 'native' else native
+            if nbytes is not None:
+                direction, n = nbytes
+                self.transfer_bytes[direction] += n
+            if hook.name.startswith('toHost<'):
+                self.to_host_copies[hook.name] = self.to_host_copies.get(hook.name, 0) + 1
+            if self.trace:
+                event = {'name': hook.name, 'cat': hook.category, 'ph': 'X'
+                    , 'ts': (start - self.start_time) * 1e6, 'dur': elapsed * 1e6
+                    , 'pid': 0, 'tid': threading.get_ident()}
+                if nbytes is not None:
+                    event['args'] = {nbytes[0]: nbytes[1]}
+                self.events.append(event)
+
+    # Python overhead and native time of all instrumented functions, sorted by total time
+    def summary(self) -> str:
+        lines = ['{:<28}{:>10}{:>14}{:>14}{:>14}'.format('function', 'calls', 'total (s)', 'native (s)', 'python (s)')]
+        for name, s in sorted(self.stats.items(), key=lambda x: -x[1].total):
+            lines.append('{:<28}{:>10}{:>14.6f}{:>14.6f}{:>14.6f}'.format(name, s.calls, s.total, s.native, s.overhead))
+        lines.append('bytes to host: {}, bytes from host: {}'.format(self.transfer_bytes['to_host']
+            , self.transfer_bytes['from_host']))
+        return '\n'.join(lines)
+
+    # Chrome trace event format. Requires the profile to be created with trace=True
+    def export_chrome_trace(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+def profile(trace: bool=False) -> Profile:
+    return Profile(trace)
+
+# Works on classes, cppyy namespaces, modules and dicts. Reads the raw class attribute
+# so staticmethods are restored as they were
+def get_attr(target, attr):
+    if isinstance(target, dict):
+        return target.get(attr)
+    if isinstance(target, type) and attr in target.__dict__:
+        return target.__dict__[attr]
+    return getattr(target, attr, None)
+
+def set_attr(target, attr, value):
+    if isinstance(target, dict):
+        target[attr] = value
+    else:
+        setattr(target, attr, value)
+
+def tensor_bytes(t: et.Tensor) -> int:
+    from . import dtype_size
+    return t.size() * dtype_size(t.dtype())
+
+def hooks() -> list:
+    # The shims look up each other (and the native helpers) at call time, so
+    # patching the module globals and etpy catches the internal calls too
+    pkg = importlib.import_module(__package__)
+    to_host = lambda args, res: ('to_host', tensor_bytes(args[0]))
+    res = [
+        Hook('Tensor.__getitem__', 'wrapper', et.Tensor, '__getitem__', None),
+        Hook('Tensor.__setitem__', 'wrapper', et.Tensor, '__setitem__', None),
+        Hook('Tensor.item', 'wrapper', et.Tensor, 'item', None),
+        Hook('Tensor.toHost', 'wrapper', et.Tensor, 'toHost', None),
+        Hook('pythonic_shape_func', 'wrapper', pkg.__dict__, 'pythonic_shape_func', None),
+        Hook('Shape.__getitem__', 'wrapper', et.Shape, '__getitem__', None),
+        Hook('Shape.__setitem__', 'wrapper', et.Shape, '__setitem__', None),
+        Hook('Shape.to_list', 'wrapper', et.Shape, 'to_list', None),
+        Hook('ones', 'native', pkg.__dict__, 'cpp_ones', None),
+        Hook('zeros', 'native', pkg.__dict__, 'cpp_zeros', None),
+        Hook('pointView', 'native', etpy, 'pointView', None),
+        Hook('indexView', 'native', etpy, 'indexView', None),
+        Hook('assignIndexed', 'native', etpy, 'assignIndexed', None),
+        Hook('tensorFromAddress', 'native', etpy, 'tensorFromAddress'
+            , lambda args, res: ('from_host', tensor_bytes(res))),
+        Hook('copyToAddress', 'native', etpy, 'copyToAddress', None),
+    ]
+    if 'tensor_to_np' in pkg.__dict__: # numpy is available
+        # Counted here since plain host tensors are copied by numpy itself
+        to_np = lambda args, res: ('to_host', res.nbytes)
+        res += [
+            Hook('Tensor.numpy', 'wrapper', et.Tensor, 'numpy', to_np),
+            Hook('Tensor.numpy', 'wrapper', pkg.__dict__, 'tensor_to_np', to_np),
+            Hook('Tensor.from_numpy', 'wrapper', et.Tensor, 'from_numpy', None),
+            Hook('Tensor.from_numpy', 'wrapper', pkg.__dict__, 'tensor_from_numpy', None),
+        ]
+    dtype_names = {int(et.DType.Bool): 'Bool', int(et.DType.Int32): 'Int32', int(et.DType.Float): 'Float'
+        , int(et.DType.Half): 'Half'}
+    for d in list(pkg.to_host_dispatch):
+        name = 'toHost<{}>'.format(dtype_names.get(d, d))
+        res.append(Hook(name, 'native', pkg.to_host_dispatch, d, to_host))
+    for d in list(pkg.item_dispatch):
+        res.append(Hook('item<{}>'.format(dtype_names.get(d, d)), 'native', pkg.item_dispatch, d, None))
+    return res
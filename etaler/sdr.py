@@ -0,0 +1,116 @@
+# Sparse SDR. Stores the (flat) indices of the active bits instead of a dense
+# boolean tensor. SDRs are usually ~2% dense, so this is a lot smaller.
+import cppyy
+import numpy as np
+
+from . import et, etpy, host_array
+
+cppyy.cppdef("""
+namespace etpy {
+
+inline std::vector<int32_t> activeIndices(const et::Tensor& x)
+{
+	et::Tensor t = x.dtype() == et::DType::Bool ? x : x.cast(et::DType::Bool);
+	std::vector<int32_t> res;
+	std::uintptr_t address = hostAddress(t);
+	if(address != 0) {
+		const bool* ptr = reinterpret_cast<const bool*>(address);
+		for(size_t i=0;i<t.size();i++) {
+			if(ptr[i])
+				res.push_back(i);
+		}
+	}
+	else {
+		auto vec = t.toHost<bool>();
+		for(size_t i=0;i<vec.size();i++) {
+			if(vec[i])
+				res.push_back(i);
+		}
+	}
+	return res;
+}
+
+inline et::Tensor tensorFromIndices(const et::Shape& shape, std::uintptr_t address, size_t num_active, et::Backend* backend)
+{
+	const int32_t* indices = reinterpret_cast<const int32_t*>(address);
+	std::unique_ptr<bool[]> dense(new bool[shape.volume()]());
+	for(size_t i=0;i<num_active;i++)
+		dense[indices[i]] = true;
+	return et::Tensor(shape, dense.get(), backend);
+}
+
+}
+""")
+
+class SDR:
+    def __init__(self, shape, active=()):
+        self.shape = tuple(int(d) for d in shape)
+        # Sorted and unique. The set operations rely on it
+        self.active = np.unique(np.asarray(active, dtype=np.int32).ravel())
+        if len(self.active) != 0 and (self.active[0] < 0 or self.active[-1] >= self.size):
+            raise IndexError("Active bit out of range for shape {}".format(self.shape))
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def sparsity(self) -> float:
+        return len(self.active) / self.size if self.size != 0 else 0.0
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+    @staticmethod
+    def from_tensor(t: et.Tensor) -> 'SDR':
+        vec = etpy.activeIndices(t)
+        sdr = SDR.__new__(SDR)
+        sdr.shape = tuple(t.shape())
+        # The indices are produced in order. View the vector instead of copying
+        sdr.active = host_array(etpy.vectorAddress(vec), (vec.size(),), np.int32, vec) if vec.size() != 0 \
+            else np.empty(0, dtype=np.int32)
+        return sdr
+
+    def to_tensor(self, backend=None) -> et.Tensor:
+        backend = et.defaultBackend() if backend is None else backend
+        active = np.ascontiguousarray(self.active, dtype=np.int32)
+        return etpy.tensorFromIndices(et.Shape(self.shape), active.ctypes.data, len(active), backend)
+
+    def numpy(self) -> np.ndarray:
+        dense = np.zeros(self.size, dtype=np.bool_)
+        dense[self.active] = True
+        return dense.reshape(self.shape)
+
+    def _check_shape(self, other: 'SDR'):
+        if self.shape != other.shape:
+            raise ValueError("SDR shapes {} and {} mismatch".format(self.shape, other.shape))
+
+    def _from_sorted(self, active) -> 'SDR':
+        sdr = SDR.__new__(SDR)
+        sdr.shape = self.shape
+        sdr.active = active.astype(np.int32, copy=False)
+        return sdr
+
+    # Number of bits active in both SDRs
+    def overlap(self, other: 'SDR') -> int:
+        self._check_shape(other)
+        return len(np.intersect1d(self.active, other.active, assume_unique=True))
+
+    def union(self, other: 'SDR') -> 'SDR':
+        self._check_shape(other)
+        return self._from_sorted(np.union1d(self.active, other.active))
+
+    def intersection(self, other: 'SDR') -> 'SDR':
+        self._check_shape(other)
+        return self._from_sorted(np.intersect1d(self.active, other.active, assume_unique=True))
+
+    __or__ = union
+    __and__ = intersection
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SDR):
+            return NotImplemented
+        return self.shape == other.shape and np.array_equal(self.active, other.active)
+
+    def __repr__(self):
+        return 'SDR(shape={}, active={})'.format(self.shape, self.active.tolist())
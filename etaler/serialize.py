@@ -0,0 +1,214 @@
+# Pythonic access to et::StateDict (the format used by et.save and et.load)
+import cppyy
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import numbers
+import threading
+
+from . import et, std
+
+try:
+    import numpy as np
+    from . import host_array, narrow_array
+except ImportError:
+    np = None
+
+cppyy.cppdef("""
+namespace etpy {
+
+// Location of a std::vector<T> stored in a std::any. Lets Python view it without copying
+template <typename T>
+inline std::pair<std::uintptr_t, size_t> anyVectorData(std::any& a)
+{
+	auto vec = std::any_cast<std::vector<T>>(&a);
+	return {reinterpret_cast<std::uintptr_t>(vec->data()), vec->size()};
+}
+
+inline et::StateDict* anyStateDict(std::any& a)
+{
+	return std::any_cast<et::StateDict>(&a);
+}
+
+template <typename T>
+inline void stateDictSet(et::StateDict& s, const std::string& key, const T& value)
+{
+	s[key] = value;
+}
+
+// A copy of `s` not sharing any tensor with it (nested StateDicts included). So it
+// can be written while the original tensors are modified in place
+inline et::StateDict snapshotStateDict(const et::StateDict& s)
+{
+	et::StateDict res;
+	for(const auto& [key, value] : s) {
+		if(auto t = std::any_cast<et::Tensor>(&value))
+			res[key] = t->copy();
+		else if(auto vec = std::any_cast<std::vector<et::Tensor>>(&value)) {
+			std::vector<et::Tensor> copies;
+			for(const auto& x : *vec)
+				copies.push_back(x.copy());
+			res[key] = copies;
+		}
+		else if(auto nested = std::any_cast<et::StateDict>(&value))
+			res[key] = snapshotStateDict(*nested);
+		else
+			res[key] = value;
+	}
+	return res;
+}
+
+// Store a buffer of host memory as a std::vector<T>
+template <typename T>
+inline void stateDictSetVector(et::StateDict& s, const std::string& key, std::uintptr_t address, size_t size)
+{
+	const T* ptr = reinterpret_cast<const T*>(address);
+	s[key] = std::vector<T>(ptr, ptr+size);
+}
+
+}
+""")
+etpy = cppyy.gbl.etpy
+
+_type_table = None
+def stored_types() -> dict:
+    # Built on first use. Creating the typeids requires instantiating the templates
+    global _type_table
+    if _type_table is None:
+        aval_type = (et.Tensor, std.string, et.Shape, std.int32_t, float, bool, std.vector[et.Tensor]
+            , std.vector[std.int32_t], std.vector[float], std.vector[et.half])
+        _type_table = {cppyy.typeid(x).name():x for x in aval_type}
+    return _type_table
+
+_vector_types = None
+def vector_types() -> dict:
+    # std::vector types that are viewed as numpy arrays. Maps typeid -> (C++ type name, numpy type)
+    global _vector_types
+    if _vector_types is None:
+        _vector_types = {
+            cppyy.typeid(std.vector[float]).name(): ('float', np.float32),
+            cppyy.typeid(std.vector[std.int32_t]).name(): ('int32_t', np.int32),
+            cppyy.typeid(std.vector[et.half]).name(): ('et::half', np.float16),
+        }
+    return _vector_types
+
+_cpp_value_types = None
+def cpp_value_types() -> tuple:
+    global _cpp_value_types
+    if _cpp_value_types is None:
+        _cpp_value_types = (std.string, std.vector[et.Tensor], std.vector[std.int32_t], std.vector[float]
+            , std.vector[et.half])
+    return _cpp_value_types
+
+# A read-only, dict-like view of a et.StateDict. Entries are only converted to
+# Python objects when accessed. std::vector<float/int32_t/half> entries are returned
+# as numpy arrays sharing memory with the StateDict
+class LazyStateDict(Mapping):
+    def __init__(self, state_dict: et.StateDict, owner=None):
+        self.state_dict = state_dict
+        # Nested StateDicts live inside their parent. Keep it alive
+        self.owner = owner
+        self.decoded = {}
+
+    def __getitem__(self, key: str):
+        if key in self.decoded:
+            return self.decoded[key]
+        if key not in self.state_dict:
+            raise KeyError(key)
+        value = self.decode(self.state_dict.at(key))
+        self.decoded[key] = value
+        return value
+
+    def __iter__(self):
+        return iter([str(k) for k, _ in self.state_dict])
+
+    def __len__(self) -> int:
+        return self.state_dict.size()
+
+    def __contains__(self, key) -> bool:
+        return key in self.state_dict
+
+    def decode(self, value):
+        type_name = value.type().name()
+        if type_name == cppyy.typeid(et.StateDict).name():
+            return LazyStateDict(etpy.anyStateDict(value), self)
+        elif np is not None and type_name in vector_types():
+            cpp_type, nptype = vector_types()[type_name]
+            address, size = etpy.anyVectorData[cpp_type](value)
+            if size == 0:
+                return np.empty(0, dtype=nptype)
+            return host_array(address, (size,), nptype, self, readonly=True) # a view of the loaded data
+        elif type_name in stored_types():
+            return std.any_cast[stored_types()[type_name]](value)
+        raise TypeError("Stored type not recognized by Etaler")
+
+    # Decode every entry (recursively) into a plain dict
+    def to_dict(self) -> dict:
+        return {k: v.to_dict() if isinstance(v, LazyStateDict) else v for k, v in self.items()}
+
+    def __repr__(self):
+        return 'LazyStateDict({})'.format(list(self))
+
+# Convert (nested) dicts into a et.StateDict. Supported values are:
+#  * dicts/Mappings -> nested et.StateDict
+#  * et.Tensor, et.Shape, str, bool, int (as int32_t) and float
+#  * numpy arrays -> et.Tensor (converted in bulk)
+#  * lists/tuples of numbers -> std::vector<int32_t/float>, lists of et.Tensor -> std::vector<et::Tensor>
+#  * std::string and std::vector values as returned by et.load
+# With `snapshot=True` tensors are copied, so later in-place changes are not seen
+def dict_to_state_dict(d: Mapping, snapshot: bool=False) -> et.StateDict:
+    state = et.StateDict()
+    for k, v in d.items():
+        k = str(k)
+        if type(v) is et.StateDict:
+            etpy.stateDictSet[et.StateDict](state, k, etpy.snapshotStateDict(v) if snapshot else v)
+        elif isinstance(v, LazyStateDict): # copied natively
+            etpy.stateDictSet[et.StateDict](state, k, etpy.snapshotStateDict(v.state_dict) if snapshot else v.state_dict)
+        elif isinstance(v, Mapping):
+            etpy.stateDictSet[et.StateDict](state, k, dict_to_state_dict(v, snapshot))
+        elif type(v) is et.Tensor:
+            etpy.stateDictSet[et.Tensor](state, k, v.copy() if snapshot else v)
+        elif type(v) is et.Shape:
+            etpy.stateDictSet[et.Shape](state, k, v)
+        elif type(v) in cpp_value_types(): # ex: values from a non-lazy et.load
+            etpy.stateDictSet[type(v)](state, k, v)
+        elif isinstance(v, str):
+            etpy.stateDictSet[std.string](state, k, v)
+        elif np is not None and isinstance(v, np.ndarray):
+            etpy.stateDictSet[et.Tensor](state, k, et.Tensor.from_numpy(v))
+        elif isinstance(v, bool) or (np is not None and isinstance(v, np.bool_)):
+            etpy.stateDictSet[bool](state, k, bool(v))
+        elif isinstance(v, numbers.Integral):
+            etpy.stateDictSet['int32_t'](state, k, int(v))
+        elif isinstance(v, numbers.Real):
+            etpy.stateDictSet[float](state, k, float(v))
+        elif isinstance(v, (list, tuple)) and all(type(x) is et.Tensor for x in v):
+            vec = std.vector[et.Tensor]([x.copy() if snapshot else x for x in v])
+            etpy.stateDictSet[std.vector[et.Tensor]](state, k, vec)
+        elif np is not None and isinstance(v, (list, tuple)):
+            set_vector(state, k, np.asarray(v))
+        else:
+            raise TypeError("Cannot store value of type {} (key {})".format(type(v), k))
+    return state
+
+def set_vector(state: et.StateDict, key: str, array):
+    if array.dtype.kind in 'iub':
+        array = narrow_array(array, np.int32)
+        etpy.stateDictSetVector['int32_t'](state, key, array.ctypes.data, array.size)
+    elif array.dtype == np.float16:
+        array = np.ascontiguousarray(array)
+        etpy.stateDictSetVector['et::half'](state, key, array.ctypes.data, array.size)
+    elif array.dtype.kind == 'f':
+        array = narrow_array(array, np.float32)
+        etpy.stateDictSetVector['float'](state, key, array.ctypes.data, array.size)
+    else:
+        raise TypeError("Cannot store a list of {} (key {})".format(array.dtype, key))
+
+# Checkpoints are written one at a time by a single background thread
+_save_executor = None
+_save_executor_lock = threading.Lock()
+def save_executor() -> ThreadPoolExecutor:
+    global _save_executor
+    with _save_executor_lock:
+        if _save_executor is None:
+            _save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='etaler-save')
+    return _save_executor
@@ -0,0 +1,144 @@
+# NumPy's __array_ufunc__ and __array_function__ protocols for et.Tensor. Supported
+# ufuncs and reductions run as the equivalent et:: op on the tensor's backend and
+# return an et.Tensor. Everything else converts the tensors to numpy (one bulk copy
+# each) and runs numpy's implementation, returning what numpy returns.
+#  np.logical_and(t, q)  # et.logical_and(t, q), no host round trip
+#  np.sum(t, axis=0)     # et.sum(t, 0)
+#  np.median(t)          # not supported by Etaler. Computed by numpy on t.numpy()
+import numbers
+
+import numpy as np
+
+from . import dictionaries, et
+
+# numpy ufunc -> et:: function
+ufuncs = {
+    np.add: 'add',
+    np.subtract: 'subtract',
+    np.multiply: 'mul',
+    np.true_divide: 'div',
+    np.equal: 'equal',
+    np.greater: 'greater',
+    np.less: 'lesser',
+    np.logical_and: 'logical_and',
+    np.logical_or: 'logical_or',
+    np.logical_not: 'logical_not',
+    np.negative: 'negate',
+    np.exp: 'exp',
+    np.log: 'log',
+    np.absolute: 'abs',
+    np.isnan: 'isnan',
+    np.isinf: 'isinf',
+}
+
+# ufunc.reduce -> et:: reduction
+reductions = {
+    np.add: 'sum',
+    np.maximum: 'max',
+    np.minimum: 'min',
+}
+
+# numpy function -> et:: reduction
+functions = {
+    np.sum: 'sum',
+    np.mean: 'mean',
+    np.max: 'max',
+    np.min: 'min',
+    np.argmax: 'argmax',
+    np.argmin: 'argmin',
+}
+for f, name in (('amax', 'max'), ('amin', 'min')): # aliases of max/min in newer numpy
+    if hasattr(np, f):
+        functions[getattr(np, f)] = name
+
+# et:: functions are looked up on first use. Ops missing in the installed Etaler fall back to numpy.
+# The ops are all in the core dictionary, probing for them doesn't load the others
+_resolved = {}
+def et_function(name: str):
+    if name not in _resolved:
+        _resolved[name] = dictionaries.find_loaded(et, name)
+    return _resolved[name]
+
+# Tensors are used as is. numpy arrays and scalars are sent to `backend`. None if the
+# value can't be represented by Etaler
+def as_operand(x, backend):
+    if type(x) is et.Tensor:
+        return x
+    if isinstance(x, (np.ndarray, np.generic, int, float, bool)) is False:
+        return None
+    array = np.asarray(x)
+    if array.ndim == 0:
+        array = array.reshape(1) # broadcasted by Etaler
+    try:
+        return et.Tensor.from_numpy(array, backend)
+    except ValueError: # ex: complex numbers
+        return None
+
+# Etaler's type promotion differs from numpy's for some ops. Returns the et:: function
+# and operands that match numpy's result, or None to let numpy compute it
+bool_ops = {'add': 'logical_or', 'mul': 'logical_and'}
+float_dtypes = (et.DType.Float, et.DType.Half)
+def numpy_semantics(name: str, args: list):
+    dtypes = [x.dtype() for x in args]
+    if all(d == et.DType.Bool for d in dtypes):
+        if name in bool_ops:
+            return bool_ops[name], args
+        elif name in ('subtract', 'negate'): # numpy raises
+            return None
+    if name == 'div': # true division, Etaler truncates integers
+        return name, [x if x.dtype() in float_dtypes else x.cast(et.DType.Float) for x in args]
+    return name, args
+
+def reduce(name: str, t: et.Tensor, axis=None):
+    func = et_function(name)
+    if func is None or (axis is not None and isinstance(axis, numbers.Integral) is False):
+        return None
+    if axis is None:
+        return func(t)
+    ndim = t.dimentions()
+    if axis < -ndim or axis >= ndim:
+        return None # let numpy raise the error
+    return func(t, int(axis) % ndim)
+
+def dispatch_ufunc(ufunc, method: str, inputs: tuple, kwargs: dict):
+    if method == '__call__' and ufunc in ufuncs and len(kwargs) == 0:
+        backend = next(x for x in inputs if type(x) is et.Tensor).backend()
+        args = [as_operand(x, backend) for x in inputs]
+        if any(x is None for x in args):
+            return None
+        op = numpy_semantics(ufuncs[ufunc], args)
+        if op is None:
+            return None
+        func = et_function(op[0])
+        if func is None:
+            return None
+        return func(*op[1])
+    elif method == 'reduce' and ufunc in reductions and set(kwargs) <= {'axis'} and type(inputs[0]) is et.Tensor:
+        return reduce(reductions[ufunc], inputs[0], kwargs.get('axis', 0))
+    return None
+
+def to_numpy(x):
+    if type(x) is et.Tensor:
+        return x.numpy()
+    elif isinstance(x, (list, tuple)):
+        return type(x)(to_numpy(v) for v in x)
+    return x
+
+def tensor_array_ufunc(self: et.Tensor, ufunc, method: str, *inputs, **kwargs):
+    if any(type(o) is et.Tensor for o in kwargs.get('out', ())):
+        return NotImplemented # Results are never written into a tensor
+    res = dispatch_ufunc(ufunc, method, inputs, kwargs)
+    if res is not None:
+        return res
+    return getattr(ufunc, method)(*to_numpy(inputs), **kwargs)
+
+def tensor_array_function(self: et.Tensor, func, types, args, kwargs):
+    if not all(issubclass(t, (et.Tensor, np.ndarray)) for t in types):
+        return NotImplemented # let the other types handle it
+    name = functions.get(func)
+    if name is not None and type(args[0]) is et.Tensor and len(args) <= 2 and set(kwargs) <= {'axis'}:
+        axis = args[1] if len(args) == 2 else kwargs.get('axis')
+        res = reduce(name, args[0], axis)
+        if res is not None:
+            return res
+    return func(*to_numpy(args), **{k: to_numpy(v) for k, v in kwargs.items()})
@@ -14,12 +14,15 @@ parser.add_argument('--home', dest='home', default=None, help='Where Etaler\'s h
 parser.add_argument('--cxx', dest='cxx', default='c++',  help='the c++ compiler you use')
 parser.add_argument('--opencl', dest='ocl', action='store_true', help='Wrapping the OpenCLBackned')
 parser.add_argument('--out-dir', dest='out_dir', default='.', help='output directory')
+parser.add_argument('--monolithic', dest='monolithic', action='store_true',
+        help='Generate a single dictionary instead of ones that PyEtaler loads lazily')
 
 args = parser.parse_args()
 
 user_home = args.home
 cxx = args.cxx
 enable_ocl = args.ocl
+monolithic = args.monolithic
 rfldct = 'etaler'
 
 etaler_homes = ['/usr/local/include', '/usr/include'] if user_home is None else [user_home]
@@ -45,47 +48,85 @@ if enable_ocl is False:
     etaler_headers = [x for x in etaler_headers if 'OpenCL' not in x]
 
 
+# PyEtaler loads the core dictionary at import and the others on first use.
+# Headers not under any of these folders goes into the core dictionary
+dictionary_groups = [
+    ('backends', 'Backends'),
+    ('encoders', 'Encoders'),
+    ('algorithms', 'Algorithms'),
+]
+
+def header_group(header):
+    parts = Path(header).parts
+    for name, folder in dictionary_groups:
+        if folder in parts:
+            return name
+    return 'core'
+
+dictionaries = {}
+if monolithic:
+    dictionaries[rfldct] = ('selection.xml', etaler_headers)
+else:
+    for name in ['core'] + [g[0] for g in dictionary_groups]:
+        headers = [x for x in etaler_headers if header_group(x) == name]
+        if len(headers) == 0:
+            continue
+        # Only select declarations from the group's own headers. Otherwise everything
+        # included by them (et::Tensor, etc..) ends up in every dictionary
+        selection = 'selection_%s.xml'%name
+        with open(selection, 'w') as f:
+            f.write('<lcgdict>\n')
+            for header in headers:
+                for kind in ('struct', 'function', 'enum'):
+                    f.write('   <%s pattern="et::*" file_pattern="*%s" />\n'%(kind, header))
+            if name == 'core':
+                f.write('   <enum pattern="cling::printValue*" />\n')
+            f.write('</lcgdict>\n')
+        dictionaries['%s_%s'%(rfldct, name)] = (selection, headers)
+
 print('---------generator information----------')
 print('Etaler home   : %s'%etaler_home)
 print('Interop       : Not supported now')
 print('Backends      : Not supported now')
 print('C++ compiler  : %s'%cxx)
 print('OpenCL Backend: {}'.format(enable_ocl))
+print('Dictionaries  : {}'.format(', '.join(dictionaries.keys())))
 print('Generating via cppyy...')
 
-# First we generate the redlection data
-cmd = ' '.join(
-    ['genreflex',                     # utility installed by pip when installing cppyy
-     '--verbose',                     # Show information (somehow genreflex fail without this)
-     '-s', 'selection.xml',           # selection file
-     '-o', '%s_rflx.cpp'%rfldct]+     # intermediate output file
-     etaler_headers)                  # headers themselves
-ret = os.system(cmd)
-if ret != 0:
-    print("genereflex failed. Exit code {}".format(ret))
-    exit(ret)
-else:
-    print("genreflex done")
-
-# Next we build the Python module itself
-print('Compiling binding...')
 clingflags = subprocess.check_output(
     ['cling-config',               # utility installed by pip when installing cppyy
     '--cppflags'])
 
-try:
-    subprocess.check_output(
-        [cxx]+                         # C++ compiler
-         clingflags.split()+[          # extra flags provided by cling
-         '-fPIC',                      # require position independent code
-         '-shared',                    # generate shared library
-         '-std=c++1z',                 # cppyy should have set this but to be safe.
-         '-o', '%s_rflx.so'%rfldct,    # output file
-         '-I'+etaler_home,             # include search path for Etaler headers
-         '%s_rflx.cpp'%rfldct]+        # intermediate file to compile
-         ['-lEtaler'])                 # link to Etaler
-except subprocess.CalledProcessError as e:
-    print('compilation failed (%d):' % e.returncode, e.output)
-    exit(e.returncode)
-else:
-    print('compilation done')
+for dct, (selection, headers) in dictionaries.items():
+    # First we generate the redlection data
+    cmd = ' '.join(
+        ['genreflex',                     # utility installed by pip when installing cppyy
+         '--verbose',                     # Show information (somehow genreflex fail without this)
+         '-s', selection,                 # selection file
+         '-o', '%s_rflx.cpp'%dct]+        # intermediate output file
+         headers)                         # headers themselves
+    ret = os.system(cmd)
+    if ret != 0:
+        print("genereflex failed for {}. Exit code {}".format(dct, ret))
+        exit(ret)
+    else:
+        print("genreflex done for {}".format(dct))
+
+    # Next we build the Python module itself
+    print('Compiling {}...'.format(dct))
+    try:
+        subprocess.check_output(
+            [cxx]+                         # C++ compiler
+             clingflags.split()+[          # extra flags provided by cling
+             '-fPIC',                      # require position independent code
+             '-shared',                    # generate shared library
+             '-std=c++1z',                 # cppyy should have set this but to be safe.
+             '-o', '%s_rflx.so'%dct,       # output file
+             '-I'+etaler_home,             # include search path for Etaler headers
+             '%s_rflx.cpp'%dct]+           # intermediate file to compile
+             ['-lEtaler'])                 # link to Etaler
+    except subprocess.CalledProcessError as e:
+        print('compilation failed (%d):' % e.returncode, e.output)
+        exit(e.returncode)
+    else:
+        print('compilation done')
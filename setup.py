@@ -3,6 +3,7 @@ from distutils.command.build import build
 
 import subprocess
 import shutil
+import glob
 import os
 import sys
 
@@ -18,8 +19,9 @@ class build_binding(build):
         protoc_command = ["python3", os.path.join(src_dir, "genbinding.py")]
         if subprocess.call(protoc_command) != 0:
             sys.exit(-1)
-        shutil.copyfile('etaler_rflx.so', 'etaler/etaler_rflx.so')
-        shutil.copyfile('etaler_rflx_rdict.pcm', 'etaler/etaler_rflx_rdict.pcm')
+        # One or more dictionaries depending on how the binding is generated
+        for f in glob.glob('etaler*_rflx.so') + glob.glob('etaler*_rflx_rdict.pcm'):
+            shutil.copyfile(f, os.path.join('etaler', f))
         build.run(self)
 
 setup(
@@ -5,6 +5,36 @@
 from etaler import et
 import numpy as np
 import unittest
+import asyncio
+import tempfile
+import os
+
+try:
+    import brainblocks
+except ImportError:
+    brainblocks = None
+
+class TestImport(unittest.TestCase):
+    def test_import_stats(self):
+        import etaler
+        stats = etaler.import_stats()
+        self.assertGreater(stats['import'], 0)
+        self.assertNotEqual(len(stats['dictionaries']), 0)
+
+    def test_lazy_names(self):
+        # Accessing a name loads the dictionary it lives in
+        self.assertIsNotNone(et.SpatialPooler)
+        self.assertIsNotNone(et.encoder.gridCell2dBatch)
+
+    def test_absent_names(self):
+        from etaler import dictionaries
+        self.assertFalse(hasattr(et, 'no_such_name'))
+        self.assertIn('no_such_name', dictionaries.absent) # not searched again
+        self.assertFalse(hasattr(et, 'no_such_name'))
+        self.assertIsNone(dictionaries.find_loaded(et, 'no_such_op'))
+        self.assertIn('Tensor', dir(et))
+        # Names not accessed yet are listed too (for tab completion)
+        self.assertLessEqual(set(dir(et.__dict__['_namespace'])), set(dir(et)))
 
 class TestShape(unittest.TestCase):
     def test_creation(self):
@@ -31,6 +61,10 @@ class TestShape(unittest.TestCase):
         for i in range(4):
             self.assertEqual(l[i], s[i])
 
+    def test_to_tuple(self):
+        self.assertEqual(et.Shape((4, 3, 2, 1)).to_tuple(), (4, 3, 2, 1))
+        self.assertEqual(et.Shape().to_tuple(), ())
+
     def test_stringify(self):
         self.assertEqual('<' in str(et.Shape()), False)
 
@@ -49,6 +83,28 @@ class TestTensor(unittest.TestCase):
             t = et.Tensor().from_numpy(np.zeros(2).astype(create_type))
             self.assertEqual(t.dtype(), et.typeToDType[create_type]())
 
+    def test_from_numpy_values(self):
+        a = np.arange(16).reshape(4, 4)[:, 1] # non-contiguous
+        t = et.Tensor.from_numpy(a)
+        self.assertEqual(t.shape(), et.Shape([4]))
+        self.assertEqual(t[3].item(), 13)
+
+        b = et.Tensor.from_numpy(np.array([True, False, True]))
+        self.assertEqual(b.dtype(), et.DType.Bool)
+        self.assertEqual(b.sum().item(), 2)
+
+        # Values that don't fit the Etaler type are an error, not silently wrapped
+        self.assertRaises(ValueError, et.Tensor.from_numpy, np.array([2**40, 3]))
+        self.assertRaises(ValueError, et.Tensor.from_numpy, np.array([1e300]))
+        self.assertRaises(ValueError, et.save, {'a': [2**40]}, 'unused.cereal')
+        self.assertEqual(np.add(et.ones((1,), et.DType.Int32), np.array([2**40])).tolist(), [2**40 + 1])
+
+    def test_from_buffer(self):
+        data = np.arange(6, dtype=np.int32).tobytes()
+        t = et.Tensor.from_buffer(data, et.DType.Int32, (3, 2))
+        self.assertEqual(t.shape(), et.Shape([3, 2]))
+        self.assertEqual(t[2, 1].item(), 5)
+
     def test_pythonic_ops(self):
         a = np.array([1, 2, 3, 4, 5, 6]).reshape(3, 2)
         t = et.Tensor.from_numpy(a)
@@ -96,11 +152,138 @@ class TestTensor(unittest.TestCase):
         self.assertEqual(a.sum().item(), 12)
         self.assertEqual(a[:, 0].realize().sum().item(), 3)
 
+    def test_mixed_indexing(self):
+        a = et.Tensor.from_numpy(np.arange(12).reshape(3, 4))
+        self.assertEqual(a[2, 3].item(), 11)
+        self.assertEqual(a[1, 1:3].numpy().tolist(), [5, 6])
+        self.assertEqual(a[:, ::2].shape(), et.Shape([3, 2]))
+
+        a[1, :] = et.zeros((4,))
+        self.assertEqual(a[1].numpy().tolist(), [0, 0, 0, 0])
+        a[2, 1:3] = 42
+        self.assertEqual(a[2].numpy().tolist(), [8, 42, 42, 11])
+
+    def test_numpy_view(self):
+        t = et.ones((4, 4))
+        a = np.asarray(t)
+        t[0, 0] = 7
+        self.assertEqual(a[0, 0], 7) # Shares memory with the tensor
+
+    def test_numpy_copy(self):
+        t = et.ones((4, 4))
+        a = t.numpy()
+        t[0, 0] = 7
+        self.assertEqual(a[0, 0], 1)
+
+        self.assertEqual(t[:, 1].numpy().tolist(), [1, 1, 1, 1]) # views are copied
+        self.assertEqual(et.ones((3,), et.DType.Bool).numpy().dtype, np.bool_)
+        self.assertEqual(et.ones((3,), et.DType.Half).numpy().dtype, np.float16)
+
+    def test_meta(self):
+        t = et.ones((4, 3), et.DType.Float)
+        self.assertEqual(t.meta, ((4, 3), 2, et.DType.Float, 12))
+        self.assertEqual(t.meta.shape, (4, 3))
+        self.assertEqual(t.ndim, 2)
+        self.assertEqual(et.ones(np.int32(3)).meta.shape, (3, ))
+
+    def test_iter_chunks(self):
+        a = np.arange(10 * 3, dtype=np.int32).reshape(10, 3)
+        t = et.Tensor.from_numpy(a)
+        self.assertEqual(len(t), 10)
+        chunks = list(t.iter_chunks(rows=4))
+        self.assertEqual([len(c) for c in chunks], [4, 4, 2])
+        self.assertTrue(np.shares_memory(chunks[0], np.asarray(t))) # views of the host memory
+        self.assertEqual(np.concatenate(chunks).tolist(), a.tolist())
+
+        # Views are copied block by block
+        chunks = list(t[:, 1:].iter_chunks(rows=3))
+        self.assertEqual(np.concatenate(chunks).tolist(), a[:, 1:].tolist())
+
+        chunks = list(t.iter_chunks(rows=4, numpy=False))
+        self.assertEqual(chunks[2].shape(), et.Shape([2, 3]))
+        self.assertRaises(ValueError, t.iter_chunks, rows=0) # on the call, before iterating
+
+    def test_numpy_dispatch(self):
+        t = et.ones((4, 4), et.DType.Bool)
+        q = et.zeros((4, 4), et.DType.Bool)
+        self.assertIs(type(np.logical_and(t, q)), et.Tensor) # ran by Etaler
+        self.assertEqual(np.logical_or(t, q).numpy().all(), True)
+        self.assertEqual(type(np.add(et.ones((2, 2)), np.ones((2, 2), dtype=np.int32))), et.Tensor)
+
+        # Same results as numpy for integer division and boolean arithmetic
+        a = np.array([1, 2, 3, 7], dtype=np.int32)
+        b = np.array([2, 2, 2, 2], dtype=np.int32)
+        ta, tb = et.Tensor.from_numpy(a), et.Tensor.from_numpy(b)
+        self.assertEqual(np.true_divide(ta, tb).numpy().tolist(), np.true_divide(a, b).tolist())
+        self.assertEqual(np.divide(ta, 2).numpy().tolist(), np.divide(a, 2).tolist())
+        a = np.array([True, True, False, False])
+        b = np.array([True, False, True, False])
+        ta, tb = et.Tensor.from_numpy(a), et.Tensor.from_numpy(b)
+        self.assertEqual(np.asarray(np.add(ta, tb)).tolist(), np.add(a, b).tolist())
+        self.assertEqual(np.asarray(np.multiply(ta, tb)).tolist(), np.multiply(a, b).tolist())
+
+        s = np.sum(et.ones((4, 3)), axis=0)
+        self.assertIs(type(s), et.Tensor)
+        self.assertEqual(s.numpy().tolist(), [4, 4, 4])
+
+        # Not supported by Etaler. Falls back to numpy
+        self.assertEqual(np.median(et.ones((4, 4))), 1)
+        self.assertEqual(np.concatenate([et.ones((2,)), et.zeros((2,))]).tolist(), [1, 1, 0, 0])
+
+    def test_dlpack(self):
+        t = et.ones((4, 3), et.DType.Float)
+        a = np.from_dlpack(t)
+        self.assertTrue(np.shares_memory(a, np.asarray(t)))
+        del t # a keeps the memory alive
+        self.assertEqual(a.sum(), 12)
+
+        t = et.from_dlpack(np.arange(6, dtype=np.int32).reshape(2, 3))
+        self.assertEqual(t.shape(), et.Shape([2, 3]))
+        self.assertEqual(t.dtype(), et.DType.Int32)
+        self.assertEqual(t.__dlpack_device__(), (1, 0))
+
+    def test_half_bits(self):
+        # float16 data is moved as raw binary16 payload. Every value survives exactly
+        a = np.array([0, -0.0, 1, -2.5, 65504, 6e-8, np.inf, -np.inf], dtype=np.float16)
+        t = et.Tensor.from_numpy(a)
+        self.assertEqual(t.dtype(), et.DType.Half)
+        self.assertEqual(t.numpy().view(np.uint16).tolist(), a.view(np.uint16).tolist())
+        self.assertEqual(t[:2].numpy().view(np.uint16).tolist(), a[:2].view(np.uint16).tolist())
+
+        b = et.Tensor.from_numpy(a.astype('>f2')) # byte-swapped into native order
+        self.assertEqual(b.numpy().view(np.uint16).tolist(), a.view(np.uint16).tolist())
+
+    def test_host_buffers(self):
+        t = et.ones((4, 4))
+        vec = et.ones((32,)).toHost()
+        self.assertEqual(len(t.toHost(out=vec)), 16)
+
+        out = np.zeros((4, 4), dtype=np.int32)
+        self.assertIs(t.numpy(out=out), out)
+        self.assertEqual(out.sum(), 16)
+        self.assertRaises(ValueError, lambda: t.numpy(out=np.zeros((4, 4), dtype=np.float32)))
+
+        pool = et.HostBufferPool(max_bytes=1024)
+        a = t.numpy(out=pool)
+        pool.release(a)
+        b = t.numpy(out=pool) # the released buffer is reused
+        self.assertTrue(np.shares_memory(a, b))
+        self.assertEqual(pool.info()['hits'], 1)
+        pool.release(b)
+        self.assertEqual(t[1:3].numpy(out=pool).shape, (2, 4))
+        self.assertEqual(pool.info()['misses'], 2)
+
     def test_reshape(self):
         a = et.ones((4, 4))
         a = a.reshape((16, ))
         self.assertEqual(a.shape(), et.Shape([16, ]))
 
+    def test_item_type(self):
+        self.assertEqual(type(et.ones((1,)).item()), int)
+        self.assertEqual(type(et.ones((1,), et.DType.Bool).item()), bool)
+        self.assertEqual(type(et.ones((1,), et.DType.Float).item()), float)
+        self.assertEqual(et.ones((1,), et.DType.Half).item(), 1.0)
+
     def test_tohost(self):
         a = et.ones((3, 3))
         v = a.toHost()
@@ -158,6 +341,35 @@ class TestEncoder(unittest.TestCase):
         except:
             self.fail("Failed to encode 2D grid cell")
 
+    def test_batch(self):
+        x = np.array([0.1, 0.5, 0.9])
+        res = et.encoder.scalarBatch(x, 0, 1, 64, 8)
+        self.assertEqual(res.shape(), et.Shape([3, 64]))
+        self.assertTrue(res[1].isSame(et.encoder.scalar(0.5, 0, 1, 64, 8)))
+
+        res = et.encoder.gridCell1dBatch(x.reshape(3, 1), seed=90)
+        self.assertEqual(res.shape()[:2], et.Shape([3, 1]))
+        self.assertTrue(res[2, 0].isSame(et.encoder.gridCell1d(0.9, seed=90)))
+
+    def test_batch_2d(self):
+        res = et.encoder.gridCell2dBatch([(42, 0), (0, 42)])
+        self.assertEqual(res.shape()[0], 2)
+        self.assertTrue(res[0].isSame(et.encoder.gridCell2d((42, 0))))
+
+    def test_cached(self):
+        gc = et.encoder.cached(et.encoder.gridCell1d, max_entries=2)
+        a = gc(0.5, seed=90)
+        b = gc(0.5 + 1e-9, seed=90) # quantized into the same entry
+        self.assertTrue(a.isSame(b))
+        self.assertTrue(a.isSame(et.encoder.gridCell1d(0.5, seed=90)))
+        self.assertEqual((gc.hits, gc.misses), (1, 1))
+
+        gc(1)
+        gc(2)
+        self.assertEqual(len(gc), 2) # LRU eviction
+        gc(0.5, seed=90)
+        self.assertEqual(gc.misses, 4)
+
 class TestException(unittest.TestCase):
     def test_raise_exception(self):
         try:
@@ -181,6 +393,182 @@ class TestSP(unittest.TestCase):
         sp.setGlobalDensity(0.5)
         self.assertEqual(sp.globalDensity(), 0.5)
 
+    def test_run_sequence(self):
+        sp = et.SpatialPooler((64, ), (32, ))
+        tm = et.TemporalMemory((32, ), 4)
+        inputs = np.random.rand(10, 64) > 0.8
+        sdrs, scores = et.run_sequence(sp, tm, inputs, anomaly=True)
+        self.assertEqual(sdrs.shape(), et.Shape([10, 32]))
+        self.assertEqual(scores.shape(), et.Shape([10]))
+        self.assertEqual(et.run_sequence(sp, None, inputs, learn=False).shape(), et.Shape([10, 32]))
+
+    def test_memory_report(self):
+        t = et.ones((4, 4), et.DType.Float)
+        self.assertEqual(t.memory_report()['total'], 64)
+
+        sp = et.SpatialPooler((64, ), (32, ))
+        report = sp.memory_report()
+        self.assertIn('permanences', report['components'])
+        self.assertEqual(sum(report['backends'].values()), report['total'])
+
+    def test_compact_state(self):
+        sp = et.SpatialPooler((64, ), (32, ))
+        x = et.Tensor.from_numpy(np.random.rand(64) > 0.8)
+        for precision in et.memory.precisions:
+            compact = et.memory.compact_state(sp, precision)
+            self.assertLess(compact.nbytes, sp.memory_report()['total'])
+            restored = et.SpatialPooler((64, ), (32, ))
+            et.memory.restore_state(restored, compact)
+            self.assertEqual(restored.compute(x).numpy().shape, (32, ))
+
+        # The snapshot isn't affected by learning after it's taken
+        def saved_state(model, path):
+            et.save(model.states(), path)
+            return {k: v.numpy().tolist() for k, v in et.load(path).items() if type(v) is et.Tensor}
+        tm = et.TemporalMemory((32, ), 4)
+        inputs = np.random.rand(10, 64) > 0.8
+        et.run_sequence(sp, tm, inputs)
+        compact = et.memory.compact_state(tm, 'half')
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'tm.cereal')
+            restored = et.TemporalMemory((32, ), 4)
+            et.memory.restore_state(restored, compact)
+            expected = saved_state(restored, path)
+            et.run_sequence(sp, tm, inputs)
+            et.run_sequence(sp, restored, inputs)
+            et.memory.restore_state(restored, compact)
+            self.assertEqual(saved_state(restored, path), expected)
+
+
+class TestSDR(unittest.TestCase):
+    def test_conversion(self):
+        dense = np.zeros((4, 8), dtype=bool)
+        dense[1, 2] = dense[3, 7] = True
+        t = et.Tensor.from_numpy(dense)
+        sdr = t.to_sdr()
+        self.assertEqual(sdr.shape, (4, 8))
+        self.assertEqual(sdr.active.tolist(), [10, 31])
+        self.assertTrue(sdr.to_tensor().isSame(t))
+        self.assertEqual(sdr.numpy().tolist(), dense.tolist())
+
+    def test_set_ops(self):
+        a = et.SDR((16,), [1, 3, 5])
+        b = et.SDR((16,), [5, 3, 9])
+        self.assertEqual(a.overlap(b), 2)
+        self.assertEqual((a | b).active.tolist(), [1, 3, 5, 9])
+        self.assertEqual((a & b).active.tolist(), [3, 5])
+        with self.assertRaises(ValueError):
+            a.overlap(et.SDR((8,)))
+
+@unittest.skipIf(brainblocks is None, "brainblocks not installed")
+class TestBrainblocks(unittest.TestCase):
+    def test_round_trip(self):
+        dense = np.zeros(64, dtype=bool)
+        dense[[3, 17, 60]] = True
+        t = et.Tensor.from_numpy(dense)
+        block = t.to_brainblocks()
+        self.assertEqual(np.flatnonzero(block.output.bits).tolist(), [3, 17, 60])
+        self.assertTrue(et.Tensor.from_brainblocks(block).isSame(t))
+
+    def test_encoder(self):
+        from brainblocks.blocks import ScalarEncoder
+        se = ScalarEncoder(num_s=1024, num_as=128)
+        se.compute(0)
+        t = et.Tensor.from_brainblocks(se)
+        self.assertEqual(t.dtype(), et.DType.Bool)
+        self.assertEqual(t.sum().item(), 128)
+
+# Built inside the worker processes of ProcessRegionPool. Must be picklable
+def make_test_model(i):
+    return (et.SpatialPooler((64, ), (32, )), et.TemporalMemory((32, ), 4))
+
+class TestParallel(unittest.TestCase):
+    def test_region_pool(self):
+        regions = [(et.SpatialPooler((64, ), (32, )), et.TemporalMemory((32, ), 4)) for _ in range(3)]
+        regions.append(et.SpatialPooler((64, ), (32, )))
+        inputs = [np.random.rand(64) > 0.8 for _ in range(4)]
+        with et.parallel.RegionPool(regions, max_workers=2) as pool:
+            for _ in range(3):
+                res = pool.step(inputs)
+            self.assertEqual(len(res), 4)
+            self.assertEqual(res[0][0].shape(), et.Shape([32]))
+            self.assertIsNotNone(res[0][1])
+            self.assertIsNone(res[3][1])
+
+            res = pool.run([np.stack([x]*5) for x in inputs])
+            self.assertEqual(res[0].shape(), et.Shape([5, 32]))
+
+    def test_process_region_pool(self):
+        with et.parallel.ProcessRegionPool(make_test_model, num_models=3, num_workers=2) as pool:
+            x = pool.input_buffer((3, 64), np.bool_)
+            x[...] = np.random.rand(3, 64) > 0.8
+            res = pool.step(x)
+            self.assertEqual(len(res), 3)
+            self.assertEqual(res[0][0].shape, (32, ))
+            self.assertIsNotNone(res[2][1])
+
+            state = pool.snapshot(1)
+            self.assertIn('sp', state)
+            self.assertIn('tm', state)
+
+class TestIO(unittest.TestCase):
+    def test_npy(self):
+        values = np.random.rand(10, 2).astype(np.float32)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'values.npy')
+            np.save(path, values)
+            reader = et.io.open(path, columns=[1], chunk_rows=4)
+            self.assertEqual([len(c) for c in reader], [4, 4, 2])
+
+            encoder = lambda x: et.encoder.scalarBatch(x, 0, 1, 64, 8)
+            sp = et.SpatialPooler((64, ), (32, ))
+            tm = et.TemporalMemory((32, ), 4)
+            res = list(et.io.run(reader, encoder, sp, tm))
+            self.assertEqual(len(res), 3)
+            self.assertEqual(res[0][0].shape(), et.Shape([4, 32]))
+            self.assertEqual(res[2][1].shape(), et.Shape([2]))
+            del reader, res # release the memory map before the directory is removed
+
+class TestProfile(unittest.TestCase):
+    def test_profile(self):
+        t = et.ones([4, 4], et.DType.Float)
+        with et.profile(trace=True) as prof:
+            t[1, 2]
+            t.toHost()
+            et.Tensor.from_numpy(np.zeros((2, 3), dtype=np.int32))
+        self.assertEqual(prof.stats['Tensor.__getitem__'].calls, 1)
+        self.assertEqual(prof.to_host_copies['toHost<Float>'], 1)
+        self.assertEqual(prof.transfer_bytes['to_host'], 16 * 4)
+        self.assertEqual(prof.transfer_bytes['from_host'], 6 * 4)
+        self.assertGreater(prof.stats['Tensor.toHost'].total, 0)
+
+        # Nothing is recorded once the profile ends
+        t[1, 2]
+        self.assertEqual(prof.stats['Tensor.__getitem__'].calls, 1)
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'trace.json')
+            prof.export_chrome_trace(path)
+            self.assertTrue(os.path.getsize(path) > 0)
+
+class TestPipeline(unittest.TestCase):
+    def test_stream(self):
+        encoder = lambda x: et.encoder.scalarBatch(x, 0, 1, 64, 8)
+        sp = et.SpatialPooler((64, ), (32, ))
+        tm = et.TemporalMemory((32, ), 4)
+
+        async def values():
+            for i in range(10):
+                yield i / 10
+
+        async def collect(stream):
+            return [r async for r in stream(values())]
+
+        with et.pipeline.Stream([encoder, sp, tm], max_batch=4) as stream:
+            res = asyncio.run(collect(stream))
+        self.assertEqual(len(res), 10)
+        self.assertEqual(res[0][0].shape(), et.Shape([32]))
+        self.assertIsInstance(res[0][1], float)
 
 class TestStateDict(unittest.TestCase):
     def test_works_in_py(self):
@@ -223,6 +611,72 @@ class TestStateDict(unittest.TestCase):
 
         self.assertEqual(s.size(), 1)
 
+    def test_lazy_load(self):
+        sp = et.SpatialPooler((64, ), (32, ))
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'sp.cereal')
+            et.save(sp.states(), path)
+            eager = et.load(path)
+            lazy = et.load(path, lazy=True)
+        self.assertEqual(set(lazy), set(eager))
+        self.assertEqual(set(lazy.to_dict()), set(eager))
+        for k in eager:
+            if type(eager[k]) is et.Tensor:
+                self.assertTrue(lazy[k].isSame(eager[k]))
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'state.cereal')
+            et.save({'v': [1, 2, 3]}, path)
+            lazy = et.load(path, lazy=True)
+        self.assertFalse(lazy['v'].flags.writeable) # views of the loaded data are read-only
+        with self.assertRaises(ValueError):
+            lazy['v'][0] = 5
+
+    def test_delta_checkpoint(self):
+        sp = et.SpatialPooler((64, ), (32, ))
+        x = et.Tensor.from_numpy(np.random.rand(64) > 0.8)
+        with tempfile.TemporaryDirectory() as d:
+            ckpt = et.checkpoint.DeltaCheckpoint(sp, d)
+            ckpt.save()
+            sp.learn(x, sp.compute(x))
+            path = ckpt.save()
+            self.assertTrue(os.path.basename(path).startswith('delta'))
+            sp.learn(x, sp.compute(x))
+            ckpt.save()
+            self.assertEqual(len(et.checkpoint.delta_paths(d)), 1) # only the latest is kept
+
+            restored = et.SpatialPooler((64, ), (32, ))
+            et.checkpoint.restore(restored, d)
+            self.assertEqual(restored.compute(x).numpy().tolist(), sp.compute(x).numpy().tolist())
+
+    def test_save_dict(self):
+        state = {'a': np.arange(6).reshape(2, 3), 'b': {'c': 1.5, 'd': [1, 2, 3]}, 'e': et.ones((2,)), 'f': 'str'}
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'state.cereal')
+            et.save(state, path)
+            res = et.load(path)
+            et.save(res, path, background=True).result()
+            res = et.load(path)
+        self.assertEqual(res['a'].numpy().tolist(), [[0, 1, 2], [3, 4, 5]])
+        self.assertEqual(res['b']['c'], 1.5)
+        self.assertEqual(list(res['b']['d']), [1, 2, 3])
+        self.assertTrue(res['e'].isSame(et.ones((2,))))
+        self.assertEqual(res['f'], 'str')
+
+    def test_background_save_snapshot(self):
+        sp = et.SpatialPooler((64, ), (32, ))
+        x = et.Tensor.from_numpy(np.random.rand(64) > 0.5)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'sp.cereal')
+            et.save(sp.states(), path)
+            expected = et.load(path)['permanences'].numpy()
+            future = et.save(sp.states(), path, background=True)
+            for _ in range(10): # learning while the save is in flight
+                sp.learn(x, sp.compute(x))
+            future.result()
+            res = et.load(path)
+        self.assertEqual(res['permanences'].numpy().tolist(), expected.tolist())
+
     def test_failed_lookup(self):
         try:
             s = et.StateDict()